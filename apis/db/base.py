@@ -15,6 +15,7 @@ from typing import List
 from typing import TYPE_CHECKING
 
 import tinydb
+import tinydb.storages
 
 if TYPE_CHECKING:
     import tinydb.table
@@ -26,13 +27,26 @@ class SerializeAccessToDB:
 
 
 class Database:
-    def __init__(self, db_path: str, db_label: str = "db"):
-        self._db_path = os.path.abspath(os.path.normpath(db_path))
+    def __init__(self, db_path: str | None, db_label: str = "db"):
+        """A TinyDB database which supports the context manager protocol
+
+        Args:
+            db_path: Path to the JSON file that backs the database. If None, the database lives in memory
+                (for the lifetime of this object) instead
+            db_label: The name of the logger for the database
+        """
+        self._db_path = os.path.abspath(os.path.normpath(db_path)) if db_path is not None else None
         self._db: tinydb.TinyDB | None = None
         self._db_label = db_label
         self._log = logging.getLogger(db_label)
         self._opened = 0
 
+        if self._db_path is None:
+            # VV: Nobody else can access an in-memory database so there's no need to share its lock
+            self._lock = threading.RLock()
+            self._db = tinydb.TinyDB(storage=tinydb.storages.MemoryStorage)
+            return
+
         with SerializeAccessToDB.crit:
             if self._db_path not in SerializeAccessToDB.locks:
                 SerializeAccessToDB.locks[self._db_path] = threading.RLock()
@@ -41,6 +55,10 @@ class Database:
     def __enter__(self):
         self._lock.acquire()
 
+        if self._db_path is None:
+            self._opened += 1
+            return self
+
         try:
             parent_dir = os.path.dirname(self._db_path)
 
@@ -56,7 +74,8 @@ class Database:
     def __exit__(self, exc_type, exc_val, exc_tb):
         try:
             self._opened -= 1
-            if self._opened == 0:
+            # VV: Closing an in-memory database would discard its contents
+            if self._opened == 0 and self._db_path is not None:
                 self._db.close()
         except Exception:
             raise
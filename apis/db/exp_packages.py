@@ -74,7 +74,7 @@ class DatabaseExperiments(apis.db.base.Database):
         db.query(...)
     """
 
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str | None):
         super(DatabaseExperiments, self).__init__(db_path, db_label="exp")
 
     @classmethod
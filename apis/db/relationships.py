@@ -27,7 +27,7 @@ class DatabaseRelationships(apis.db.base.Database):
         db.query(...)
     """
 
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str | None):
         super(DatabaseRelationships, self).__init__(db_path, db_label="rels")
 
     @classmethod
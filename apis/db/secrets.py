@@ -63,7 +63,7 @@ class SecretsStorageTemplate:
 
 
 class DatabaseSecrets(apis.db.base.Database, SecretsStorageTemplate):
-    def __init__(self, db_path: str, db_label: str = "db_secrets"):
+    def __init__(self, db_path: str | None, db_label: str = "db_secrets"):
         super().__init__(db_path=db_path, db_label=db_label)
 
     @classmethod
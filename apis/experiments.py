@@ -1053,7 +1053,7 @@ class ExperimentList(Resource):
             problems = []
             for doc in db.query():
                 try:
-                    obj = apis.models.virtual_experiment.ParameterisedPackage.parse_obj(doc)
+                    obj = apis.models.virtual_experiment.ParameterisedPackage.model_validate(doc)
                 except pydantic.ValidationError as exc:
                     package_name = doc.get('metadata', {}).get('package', {}).get('name', '**unknown**')
                     digest = doc.get('metadata', {}).get('registry', {}).get('digest', '**unknown**')
@@ -1083,7 +1083,7 @@ class ExperimentList(Resource):
         try:
             experiment_inp = request.get_json()
             try:
-                ve = apis.models.virtual_experiment.ParameterisedPackage.parse_obj(experiment_inp)
+                ve = apis.models.virtual_experiment.ParameterisedPackage.model_validate(experiment_inp)
             except pydantic.ValidationError as e:
                 current_app.logger.warning(f"Invalid parameterised package {e}. Traceback: {traceback.format_exc()}")
                 api.abort(400, message="Invalid parameterised package", invalidVirtualExperimentDefinition=str(e))
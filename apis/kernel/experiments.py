@@ -206,7 +206,7 @@ def api_get_experiment(
     problems = []
 
     try:
-        ve = apis.models.virtual_experiment.ParameterisedPackage.parse_obj(docs[0])
+        ve = apis.models.virtual_experiment.ParameterisedPackage.model_validate(docs[0])
     except pydantic.error_wrappers.ValidationError as e:
         problems = apis.models.errors.make_pydantic_errors_jsonable(e)
 
@@ -77,7 +77,7 @@ def get_default_platform_of_package(
         docs = db_experiments.query_identifier(identifier)
 
     try:
-        ve_target = apis.models.virtual_experiment.ParameterisedPackage.parse_obj(docs[0])
+        ve_target = apis.models.virtual_experiment.ParameterisedPackage.model_validate(docs[0])
         return (ve_target.parameterisation.get_available_platforms() or ['default'])[0]
     except KeyError:
         raise apis.models.errors.ApiError(f"Unknown package {identifier}")
@@ -192,7 +192,7 @@ def synthesize_from_transformation(
         docs = db_experiments.query_identifier(rel.transform.outputGraph.identifier)
         if len(docs) == 1:
             try:
-                target = apis.models.virtual_experiment.ParameterisedPackage.parse_obj(docs[0])
+                target = apis.models.virtual_experiment.ParameterisedPackage.model_validate(docs[0])
                 target_parameterisation = target.parameterisation
             except pydantic.error_wrappers.ValidationError as e:
                 raise apis.models.errors.InvalidModelError.from_pydantic(
@@ -38,11 +38,13 @@ class DigestableBase(BaseModel):
         return cls(definition={f"item_{i}": x for i, x in enumerate(items)})
 
     def to_digest(self) -> str:
+        # VV: This is a stack, the next object to hash is at the end. Visits dictionaries in ascending key order
+        # (key followed by its value) and lists/tuples in reverse order
         remaining = [self.dict() or {'what': 'empty'}]
         sha256 = hashlib.sha256()
 
         while remaining:
-            obj = remaining.pop(0)
+            obj = remaining.pop()
             try:
                 if isinstance(obj, Digestable):
                     sha256.update(f"{type(obj)}{obj.to_digest()}".encode('utf-8'))
@@ -50,11 +52,10 @@ class DigestableBase(BaseModel):
                     sha256.update(f"{type(obj)}_{repr(obj)}".encode('utf-8'))
                 elif isinstance(obj, dict):
                     for k in sorted(obj, reverse=True):
-                        remaining.insert(0, k)
-                        remaining.insert(1, obj[k])
+                        remaining.append(obj[k])
+                        remaining.append(k)
                 elif isinstance(obj, (list, tuple)):
-                    for k in obj:
-                        remaining.insert(0, k)
+                    remaining.extend(obj)
                 else:
                     raise ValueError("Cannot generate hash of %s: %s" % (type(obj), obj))
             except Exception as e:
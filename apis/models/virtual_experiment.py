@@ -38,6 +38,11 @@ import apis.models.errors
 import apis.models.from_core
 
 
+def _utc_now() -> datetime.datetime:
+    """Returns the current time in UTC, tests may replace this to control the timestamps of registry entries"""
+    return datetime.datetime.utcnow().replace(tzinfo=datetime.timezone.utc)
+
+
 TSourceDatasetLocation = namedtuple('TSourceDatasetLocation', ['dataset_name'])
 TBaseConfig = namedtuple('TBaseConfig', ['path', 'manifestPath'])
 
@@ -825,8 +830,7 @@ class MetadataRegistry(apis.models.common.Digestable):
 
     @classmethod
     def get_time_now_as_str(self) -> str:
-        now = datetime.datetime.utcnow().replace(tzinfo=datetime.timezone.utc)
-        return now.strftime(apis.models.constants.TIME_FORMAT)
+        return _utc_now().strftime(apis.models.constants.TIME_FORMAT)
 
     def get_data_names(self) -> List[str]:
         return [x.name for x in self.data]
@@ -1448,6 +1452,9 @@ class ParameterisedPackage(apis.models.common.Digestable):
     def get_packages_identifier(self) -> str:
         """Returns a unique identifier that takes into account only the base packages of the parameterised virtual
         experiment package.
+
+        The identifier is computed on every call (it is not cached) because the base packages may be modified in place.
+        Callers that need it multiple times should keep the result (e.g. NamedPackage.get_path_to_multi_package_pvep()).
         """
         return apis.models.common.DigestableBase(base=self.base).to_digest()
 
@@ -99,7 +99,7 @@ class PolicyPrior:
           A MatchingDerived instance
         """
         pvep_source = self._api.api_experiment_get(pvep_identifier)
-        pvep_source = apis.models.virtual_experiment.ParameterisedPackage.parse_obj(pvep_source)
+        pvep_source = apis.models.virtual_experiment.ParameterisedPackage.model_validate(pvep_source)
 
         if len(pvep_source.base.packages) != 1:
             raise apis.models.errors.ApiError(f"Source parameterised virtual experiment package does not contain "
@@ -73,7 +73,7 @@ class PolicyRandomCanarySurrogate(apis.policy.PolicyPrior):
                 matching = self.kernel_query_matching_derived(pvep_identifier)
             else:
                 pvep_source = self._api.api_experiment_get(pvep_identifier)
-                pvep_source = apis.models.virtual_experiment.ParameterisedPackage.parse_obj(pvep_source)
+                pvep_source = apis.models.virtual_experiment.ParameterisedPackage.model_validate(pvep_source)
                 matching = apis.policy.MatchingDerived(
                     pvep_identifier=pvep_identifier, pvep_source=pvep_source, matching=[])
         except pydantic.error_wrappers.ValidationError as e:
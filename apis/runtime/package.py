@@ -48,6 +48,23 @@ ROOT_EMBEDDED_FILES = "/tmp/st4sd-embedded/"
 # VV: DO NOT change this - st4sd-runtime-k8s currently has a hard-coded check we'll address this in the future
 ROOT_S3_FILES = "/tmp/s3-root-dir"
 
+# VV: Maps fields of S3 credentials to the env-vars that st4sd-runtime-k8s expects
+_S3_INPUT_ENV_NAMES = {
+    "bucket": "ST4SD_S3_IN_BUCKET",
+    "endpoint": "ST4SD_S3_IN_END_POINT",
+    "accessKeyID": "ST4SD_S3_IN_ACCESS_KEY_ID",
+    "secretAccessKey": "ST4SD_S3_IN_SECRET_ACCESS_KEY",
+    "region": "ST4SD_S3_IN_REGION",
+}
+
+# VV: Notice that there's no `bucket` here - this is by design
+_S3_OUTPUT_ENV_NAMES = {
+    'accessKeyID': 'S3_ACCESS_KEY_ID',
+    'endpoint': 'S3_END_POINT',
+    'secretAccessKey': 'S3_SECRET_ACCESS_KEY',
+    'region': 'S3_REGION',
+}
+
 logger = logging.getLogger("pkg")
 
 
@@ -146,7 +163,7 @@ class NamedPackage:
         self._ve = ve
         self._namespace_presets = namespace_presets
         # VV: Digest format is "${digest algorithm}x", find the first x (delimiter) and keep 6 chars after that
-        digest = self._ve.metadata.registry.digest.split('x', 1)[1][:6]
+        digest = self._ve.metadata.registry.digest.partition('x')[2][:6]
         self._experiment_name = '-'.join((ve.metadata.package.name, digest))
         self._experiment_name = self._experiment_name.replace(' ', '-')
         self._experiment_name = self._experiment_name.replace('_', '-')
@@ -155,6 +172,8 @@ class NamedPackage:
         self._instance_name = f'{self._experiment_name}-{timestamp}'
 
         self._payload_config = payload_config
+        # VV: Computing the identifier of the base packages involves hashing all of them, do it at most once
+        self._path_to_multi_package_pvep: str | None = None
         # VV: Caller cares about CRD names collisions
         self._rest_uid = self.generate_new_rest_uid()
 
@@ -290,6 +309,11 @@ class NamedPackage:
     def pvc_working_volume(self) -> str:
         return self._extra_options.pvc_working_volume
 
+    @property
+    def configmap_embedded_files_name(self) -> str:
+        """The name of the ConfigMap which construct_k8s_configmap_embedded_files() generates"""
+        return f'files-{self.rest_uid}'
+
     @property
     def embedded_files(self) -> Dict[str, str]:
         return copy.deepcopy(self._embedded_files)
@@ -740,9 +764,11 @@ class NamedPackage:
         return injected
 
     def get_path_to_multi_package_pvep(self) -> str:
-        return os.path.join(apis.models.constants.ROOT_STORE_DERIVED_PACKAGES,
-                            self._ve.metadata.package.name,
-                            self._ve.get_packages_identifier())
+        if self._path_to_multi_package_pvep is None:
+            self._path_to_multi_package_pvep = os.path.join(apis.models.constants.ROOT_STORE_DERIVED_PACKAGES,
+                                                            self._ve.metadata.package.name,
+                                                            self._ve.get_packages_identifier())
+        return self._path_to_multi_package_pvep
 
     @property
     def workflow_spec_package(self) -> Dict[str, Any]:
@@ -986,7 +1012,7 @@ class NamedPackage:
             volumes.append({
                 'name': 'embedded-files',
                 'configMap': {
-                    'name': f'files-{self.rest_uid}',
+                    'name': self.configmap_embedded_files_name,
                     'items': cm_items
                 }
             })
@@ -1079,7 +1105,7 @@ class NamedPackage:
 
         body = {
             'metadata': {
-                'name': f'files-{self.rest_uid}',
+                'name': self.configmap_embedded_files_name,
                 'labels': {
                     'workflow': self.rest_uid
                 },
@@ -1096,9 +1122,8 @@ class NamedPackage:
         Args:
             k8s_workflow_uuid: The uuid in the metadata field of the kubernetes CRD object for this instance
         """
-        env_vars = self.environment_variables_raw
-
-        agg_env_vars = env_vars
+        # VV: environment_variables_raw returns a copy so it is safe to update it in place
+        agg_env_vars = self.environment_variables_raw
 
         # VV: We do not want to expose S3 credentials inside the Workflow object because we store that as a YAML file
         # inside the PVC that holds the virtual experiment directory. Here, we inject new environment variables
@@ -1107,30 +1132,16 @@ class NamedPackage:
         s3_creds = self._payload_config.security.s3Input.my_contents
 
         if isinstance(s3_creds, apis.models.common.OptionFromS3Values):
-            env_names = {
-                "bucket": "ST4SD_S3_IN_BUCKET",
-                "endpoint": "ST4SD_S3_IN_END_POINT",
-                "accessKeyID": "ST4SD_S3_IN_ACCESS_KEY_ID",
-                "secretAccessKey": "ST4SD_S3_IN_SECRET_ACCESS_KEY",
-                "region": "ST4SD_S3_IN_REGION",
-            }
             s3_creds = s3_creds.model_dump(exclude_none=True)
             agg_env_vars.update({
-                env_names[x]: s3_creds[x] for x in s3_creds if x in env_names
+                _S3_INPUT_ENV_NAMES[x]: s3_creds[x] for x in s3_creds if x in _S3_INPUT_ENV_NAMES
             })
 
         s3_creds = self._payload_config.security.s3Output.my_contents
         if isinstance(s3_creds, apis.models.common.OptionFromS3Values):
-            # VV: Notice that there's no `bucket` here - this is by design
-            env_names = {
-                'accessKeyID': 'S3_ACCESS_KEY_ID',
-                'endpoint': 'S3_END_POINT',
-                'secretAccessKey': 'S3_SECRET_ACCESS_KEY',
-                'region': 'S3_REGION',
-            }
             s3_creds = s3_creds.model_dump(exclude_none=True)
             agg_env_vars.update({
-                env_names[x]: s3_creds[x] for x in s3_creds if x in env_names
+                _S3_OUTPUT_ENV_NAMES[x]: s3_creds[x] for x in s3_creds if x in _S3_OUTPUT_ENV_NAMES
             })
 
         if not agg_env_vars:
@@ -1146,7 +1157,7 @@ class NamedPackage:
             },
             'data': {
                 # VV: For now support env vars that are strings - i.e. no secretKeyRef
-                str(x): base64.b64encode(agg_env_vars[x].encode('utf-8')).decode('utf-8') for x in agg_env_vars}
+                str(x): base64.b64encode(value.encode('utf-8')).decode('utf-8') for x, value in agg_env_vars.items()}
         }
         return body
 
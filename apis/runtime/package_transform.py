@@ -157,7 +157,7 @@ class TransformRelationship:
                 raise apis.models.errors.ApiError(f"Database contains multiple parameterised virtual experiment "
                                                   f"packages with the identifier \"{identifier}\"")
             try:
-                pvep = apis.models.virtual_experiment.ParameterisedPackage.parse_obj(docs[0])
+                pvep = apis.models.virtual_experiment.ParameterisedPackage.model_validate(docs[0])
             except pydantic.error_wrappers.ValidationError as e:
                 raise apis.models.errors.InvalidModelError.from_pydantic(f"{kind} {identifier} is invalid", e)
             if len(pvep.base.packages) != 1:
@@ -9,7 +9,6 @@ from __future__ import annotations
 import base64
 import logging
 import shutil
-import tempfile
 import uuid
 from typing import Dict
 from typing import List
@@ -18,8 +17,21 @@ from typing import TYPE_CHECKING
 import experiment.model.storage
 import kubernetes.client
 import pytest
-
+import yaml
+
+# VV: Prefer the libyaml C bindings when they are available, test modules should use these instead of patching yaml
+try:
+    from yaml import CSafeDumper as SafeDumper
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeDumper
+    from yaml import SafeLoader
+
+# VV: Import the modules that most tests use while pytest loads conftest.py so that the first test (or the first
+# test on each pytest-xdist worker) does not pay for initializing them
+import apis.db.exp_packages
 import apis.models.virtual_experiment
+import apis.runtime.package
 import apis.storage
 from apis.models.constants import *
 
@@ -31,6 +43,12 @@ logging.basicConfig(format=FORMAT)
 rootLogger = logging.getLogger()
 
 
+def pytest_configure(config):
+    # VV: pytest-xdist (if installed) runs the tests of an xdist_group on the same worker with --dist=loadgroup
+    config.addinivalue_line(
+        "markers", "xdist_group(name): tests which share expensive session fixtures and should run on one worker")
+
+
 def pytest_addoption(parser):
     parser.addoption('--real-packages', action='store_true', dest="real_packages",
                      default=False, help="Enable tests that involve real packages")
@@ -67,7 +85,7 @@ def local_deployment():
     importlib.reload(apis.models.constants)
 
 
-@pytest.fixture()
+@pytest.fixture(scope="session")
 def flowir_psi4() -> str:
     return """
 application-dependencies: {}
@@ -385,15 +403,13 @@ variables:
 
 
 @pytest.fixture(scope="function")
-def output_dir() -> str:
-    path = tempfile.mkdtemp()
+def output_dir(tmp_path_factory: pytest.TempPathFactory) -> str:
+    # VV: The base directory of tmp_path_factory is unique to each pytest-xdist worker
+    path = str(tmp_path_factory.mktemp("output"))
 
     yield path
 
-    try:
-        shutil.rmtree(output_dir, ignore_errors=True)
-    except FileNotFoundError:
-        pass
+    shutil.rmtree(path, ignore_errors=True)
 
 
 def populate_files(location: str, extra_files: Dict[str, str]):
@@ -481,7 +497,7 @@ def ve_toxicity_pred() -> apis.models.virtual_experiment.ParameterisedPackage:
                         "runtime": {"args": ["--registerWorkflow=yes"], "resources": {}},
                         "variables": []}}}
 
-    return apis.models.virtual_experiment.ParameterisedPackage.parse_obj(desc)
+    return apis.models.virtual_experiment.ParameterisedPackage.model_validate(desc)
 
 
 @pytest.fixture
@@ -516,7 +532,7 @@ def ve_toxicity_pred_one_executionoption_platform() -> apis.models.virtual_exper
                         "runtime": {"args": ["--registerWorkflow=yes"], "resources": {}},
                         "variables": []}}}
 
-    return apis.models.virtual_experiment.ParameterisedPackage.parse_obj(desc)
+    return apis.models.virtual_experiment.ParameterisedPackage.model_validate(desc)
 
 
 @pytest.fixture
@@ -550,7 +566,7 @@ def ve_toxicity_pred_preset_platform() -> apis.models.virtual_experiment.Paramet
                         "runtime": {"args": ["--registerWorkflow=yes"], "resources": {}},
                         "variables": []}}}
 
-    return apis.models.virtual_experiment.ParameterisedPackage.parse_obj(desc)
+    return apis.models.virtual_experiment.ParameterisedPackage.model_validate(desc)
 
 
 @pytest.fixture
@@ -868,8 +884,12 @@ output:
     """
 
 
-@pytest.fixture(scope="function")
-def ve_sum_numbers():
+@pytest.fixture(scope="session")
+def ve_sum_numbers_readonly():
+    """The sum-numbers parameterised virtual experiment package, shared by all tests in the session
+
+    Tests MUST NOT modify this object, those which need to should use the ve_sum_numbers fixture instead.
+    """
     sum_numbers_def = {
         "base": {
             "packages": [{
@@ -905,13 +925,21 @@ def ve_sum_numbers():
             }
         }
     }
-    ve = apis.models.virtual_experiment.ParameterisedPackage.parse_obj(sum_numbers_def)
+    ve = apis.models.virtual_experiment.ParameterisedPackage.model_validate(sum_numbers_def)
     ve.update_digest()
 
     assert ve.metadata.registry.digest is not None
     return ve
 
 
+@pytest.fixture(scope="function")
+def ve_sum_numbers(
+        ve_sum_numbers_readonly: apis.models.virtual_experiment.ParameterisedPackage
+) -> apis.models.virtual_experiment.ParameterisedPackage:
+    """A private copy of ve_sum_numbers_readonly which the test is free to modify"""
+    return ve_sum_numbers_readonly.copy(deep=True)
+
+
 @pytest.fixture
 def ve_sum_numbers_executionoptions_platform_no_values():
     sum_numbers_def = {
@@ -947,7 +975,7 @@ def ve_sum_numbers_executionoptions_platform_no_values():
             }
         }
     }
-    return apis.models.virtual_experiment.ParameterisedPackage.parse_obj(sum_numbers_def)
+    return apis.models.virtual_experiment.ParameterisedPackage.model_validate(sum_numbers_def)
 
 @pytest.fixture(scope="function")
 def sum_numbers_ve_dataset():
@@ -985,7 +1013,7 @@ def sum_numbers_ve_dataset():
             }
         }
     }
-    ve = apis.models.virtual_experiment.ParameterisedPackage.parse_obj(sum_numbers_def)
+    ve = apis.models.virtual_experiment.ParameterisedPackage.model_validate(sum_numbers_def)
     ve.update_digest()
 
     assert ve.metadata.registry.digest is not None
@@ -1254,7 +1282,7 @@ def derived_ve():
             }
         }
     }
-    ve = apis.models.virtual_experiment.ParameterisedPackage.parse_obj(package)
+    ve = apis.models.virtual_experiment.ParameterisedPackage.model_validate(package)
     ve.update_digest()
 
     assert ve.metadata.registry.digest is not None
@@ -2184,7 +2212,7 @@ def ve_dsl2_with_key_output() -> apis.models.virtual_experiment.ParameterisedPac
         }}
     }
 
-    return apis.models.virtual_experiment.ParameterisedPackage.parse_obj(desc)
+    return apis.models.virtual_experiment.ParameterisedPackage.model_validate(desc)
 
 @pytest.fixture()
 def rel_simple_relationship() -> Dict[str, Any]:
@@ -2512,7 +2540,7 @@ def derived_ve_gamess_homo_dft_ani():
             }
         }
     }
-    ve = apis.models.virtual_experiment.ParameterisedPackage.parse_obj(package)
+    ve = apis.models.virtual_experiment.ParameterisedPackage.model_validate(package)
     ve.update_digest()
 
     assert ve.metadata.registry.digest is not None
@@ -2837,7 +2865,7 @@ def ve_homo_lumo_dft_gamess_us() -> apis.models.virtual_experiment.Parameterised
             }
         }
     }
-    ve = apis.models.virtual_experiment.ParameterisedPackage.parse_obj(package)
+    ve = apis.models.virtual_experiment.ParameterisedPackage.model_validate(package)
     ve.update_digest()
 
     assert ve.metadata.registry.digest is not None
@@ -2873,7 +2901,7 @@ def ve_psi4() -> apis.models.virtual_experiment.ParameterisedPackage:
             }
         }
     }
-    ve = apis.models.virtual_experiment.ParameterisedPackage.parse_obj(package)
+    ve = apis.models.virtual_experiment.ParameterisedPackage.model_validate(package)
     ve.update_digest()
 
     assert ve.metadata.registry.digest is not None
@@ -2909,7 +2937,7 @@ def ve_neural_potential() -> apis.models.virtual_experiment.ParameterisedPackage
             }
         }
     }
-    ve = apis.models.virtual_experiment.ParameterisedPackage.parse_obj(package)
+    ve = apis.models.virtual_experiment.ParameterisedPackage.model_validate(package)
     ve.update_digest()
 
     assert ve.metadata.registry.digest is not None
@@ -2950,7 +2978,7 @@ def ve_modular_optimizer() -> apis.models.virtual_experiment.ParameterisedPackag
             }
         }
     }
-    ve = apis.models.virtual_experiment.ParameterisedPackage.parse_obj(package)
+    ve = apis.models.virtual_experiment.ParameterisedPackage.model_validate(package)
     ve.update_digest()
 
     assert ve.metadata.registry.digest is not None
@@ -3040,7 +3068,7 @@ def ve_modular_ani() -> apis.models.virtual_experiment.ParameterisedPackage:
             }
         }
     }
-    ve = apis.models.virtual_experiment.ParameterisedPackage.parse_obj(package)
+    ve = apis.models.virtual_experiment.ParameterisedPackage.model_validate(package)
     ve.update_digest()
 
     assert ve.metadata.registry.digest is not None
@@ -3136,7 +3164,7 @@ def ve_modular_band_gap_gamess() -> apis.models.virtual_experiment.Parameterised
             }
         }
     }
-    ve = apis.models.virtual_experiment.ParameterisedPackage.parse_obj(package)
+    ve = apis.models.virtual_experiment.ParameterisedPackage.model_validate(package)
     ve.update_digest()
 
     assert ve.metadata.registry.digest is not None
@@ -3315,7 +3343,7 @@ def ve_configuration_generator_ani() -> apis.models.virtual_experiment.Parameter
             }
         }
     }
-    ve = apis.models.virtual_experiment.ParameterisedPackage.parse_obj(package)
+    ve = apis.models.virtual_experiment.ParameterisedPackage.model_validate(package)
     ve.update_digest()
 
     assert ve.metadata.registry.digest is not None
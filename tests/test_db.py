@@ -57,7 +57,7 @@ def test_insert(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPack
 
         # VV: Make sure that there are 2 entries in the db, and that the old one does not have a registry tag
         with apis.db.exp_packages.DatabaseExperiments(f.name) as db:
-            many = [apis.models.virtual_experiment.ParameterisedPackage.parse_obj(x) for x in db.query()]
+            many = [apis.models.virtual_experiment.ParameterisedPackage.model_validate(x) for x in db.query()]
 
         many = sorted(many, key=lambda x: x.registry_created_on)
         assert len(many) == 2
@@ -85,11 +85,38 @@ def test_insert_many_same(ve_sum_numbers: apis.models.virtual_experiment.Paramet
 
         # VV: Make sure that there are 2 entries in the db, and that the old one does not have a registry tag
         with apis.db.exp_packages.DatabaseExperiments(f.name) as db:
-            many = [apis.models.virtual_experiment.ParameterisedPackage.parse_obj(x) for x in db.query()]
+            many = [apis.models.virtual_experiment.ParameterisedPackage.model_validate(x) for x in db.query()]
 
         assert len(many) == 1
 
 
+def test_in_memory_keeps_entries_between_sessions(
+        ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage
+):
+    db = apis.db.exp_packages.DatabaseExperiments(db_path=None)
+
+    with db:
+        db.push_new_entry(ve_sum_numbers)
+
+    with db:
+        many = [apis.models.virtual_experiment.ParameterisedPackage.model_validate(x) for x in db.query()]
+
+    assert len(many) == 1
+    assert many[0].metadata.registry.digest == ve_sum_numbers.metadata.registry.digest
+
+
+def test_database_file_is_plain_json(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
+    with tempfile.NamedTemporaryFile(suffix=".json", prefix="experiments", delete=True) as f:
+        with apis.db.exp_packages.DatabaseExperiments(f.name) as db:
+            db.push_new_entry(ve_sum_numbers)
+            docs = db.query()
+
+        with open(f.name) as fd:
+            raw = json.load(fd)
+
+    assert list(raw['_default'].values()) == docs
+
+
 def test_record_timesExecuted(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
     with tempfile.NamedTemporaryFile(suffix=".json", prefix="experiments", delete=True) as f:
         with apis.db.exp_packages.DatabaseExperiments(f.name) as db:
@@ -102,7 +129,7 @@ def test_record_timesExecuted(ve_sum_numbers: apis.models.virtual_experiment.Par
                     registry_digest=ve_sum_numbers.metadata.registry.digest))
 
         with apis.db.exp_packages.DatabaseExperiments(f.name) as db:
-            many = [apis.models.virtual_experiment.ParameterisedPackage.parse_obj(x) for x in db.query()]
+            many = [apis.models.virtual_experiment.ParameterisedPackage.model_validate(x) for x in db.query()]
 
         pprint.pprint(many)
 
@@ -203,7 +230,7 @@ def test_update_tags_with_single_parameterised_package(
                 db.tag_update(ve_sum_numbers.metadata.package.name, ["latest", f"lbl-{idx}"])
 
         with apis.db.exp_packages.DatabaseExperiments(f.name) as db:
-            many = [apis.models.virtual_experiment.ParameterisedPackage.parse_obj(x) for x in db.query()]
+            many = [apis.models.virtual_experiment.ParameterisedPackage.model_validate(x) for x in db.query()]
 
         pprint.pprint(many)
 
@@ -257,7 +284,7 @@ def test_update_tags_with_many_parameterised_packages(
 
         ql = db.construct_query(package_name=ve_sum_numbers.metadata.package.name)
         with apis.db.exp_packages.DatabaseExperiments(f.name) as db:
-            many = [apis.models.virtual_experiment.ParameterisedPackage.parse_obj(x)
+            many = [apis.models.virtual_experiment.ParameterisedPackage.model_validate(x)
                     for x in db.query(ql)]
 
         log.info(pprint.pformat(many))
@@ -270,7 +297,7 @@ def test_update_tags_with_many_parameterised_packages(
             digest=None).identifier
 
         with apis.db.exp_packages.DatabaseExperiments(f.name) as db:
-            single = [apis.models.virtual_experiment.ParameterisedPackage.parse_obj(x)
+            single = [apis.models.virtual_experiment.ParameterisedPackage.model_validate(x)
                       for x in db.query_identifier(new_identifier)]
 
         log.info(pprint.pformat(single))
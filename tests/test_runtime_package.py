@@ -7,21 +7,27 @@
 from __future__ import annotations
 
 import base64
+import datetime
+import functools
+import itertools
 import json
 import logging
+import operator
 import os
-import tempfile
-import time
 
+from typing import Any
+from typing import Callable
 from typing import Dict
 from typing import List
+from typing import Sequence
+from typing import Tuple
 
 import pytest
 import yaml
-
-import pydantic
+from pydantic import ValidationError
 
 import apis.db.exp_packages
+import apis.db.secrets
 import apis.models.common
 import apis.models.constants
 import apis.models.errors
@@ -30,47 +36,436 @@ import apis.runtime.package
 import apis.storage
 import tests.conftest
 
-import apis.kernel.internal_experiments
-
-
 
 package_from_files = tests.conftest.package_from_files
+_SafeDumper = tests.conftest.SafeDumper
+_SafeLoader = tests.conftest.SafeLoader
 
 logger = logging.getLogger('trp')
 
+# VV: Set the environment variable ST4SD_TEST_VERBOSE=1 to print the Workflow objects that the tests generate
+_VERBOSE = os.environ.get("ST4SD_TEST_VERBOSE") == "1"
+
+
+def _debug_spec(spec: Dict[str, Any]):
+    """Prints @spec as JSON when ST4SD_TEST_VERBOSE=1, JSON is much cheaper to generate than YAML"""
+    if _VERBOSE:
+        print(json.dumps(spec, default=str, indent=2))
+
+
+_MOUNT_PVC = os.path.join(apis.runtime.package.ROOT_VOLUME_MOUNTS, 'pvc')
+_MOUNT_SECRET = os.path.join(apis.runtime.package.ROOT_VOLUME_MOUNTS, 'secret')
+
+# VV: Volumes and volumeMounts that the expected Workflow specs share. Tests must not modify them
+_VOL_BASE_MAIN = {'name': 'base-main', 'persistentVolumeClaim': {'claimName': 'my-test'}}
+_VOL_MOUNT_BASE_MAIN = {'mountPath': '/tmp/st4sd-workflow-definitions/main', 'name': 'base-main'}
+_VOL_MOUNT_EMBEDDED_FILES = {'name': 'embedded-files', 'mountPath': apis.runtime.package.ROOT_EMBEDDED_FILES}
+
+_EXPECTED_S3_DATA = f"{apis.runtime.package.ROOT_S3_FILES}/data/some/path/cat_me.txt"
+
+
+@functools.lru_cache(maxsize=None)
 def b64_str(value: str) -> str:
+    """Returns the base64 encoding of a utf-8 string, tests only ever encode a handful of distinct values"""
     return base64.b64encode(value.encode('utf-8')).decode('utf-8')
 
 
+# VV: The base64 encoded values of the dummy S3 credentials that the tests use
+_B64_ACCESS = b64_str('accessKeyID')
+_B64_SECRET = b64_str('secretAccessKey')
+_B64_ENDPOINT = b64_str('endpoint')
+_B64_BUCKET = b64_str('bucket')
+_B64_REGION = b64_str('region')
+
+# VV: Payload fragments with the dummy S3 credentials, tests must not modify them
+_S3_INPUT_CREDS = {
+    "accessKeyID": "accessKeyID",
+    "secretAccessKey": "secretAccessKey",
+    "endpoint": "endpoint",
+    "bucket": "bucket",
+}
+_S3_OUTPUT_CREDS = {**_S3_INPUT_CREDS, "bucket": "my-bucket"}
+_SECURITY_S3_INPUT = {'security': {'s3Input': {'valueFrom': {'s3Ref': _S3_INPUT_CREDS}}}}
+_SECURITY_S3_OUTPUT = {'security': {'s3Output': {'valueFrom': {'s3Ref': _S3_OUTPUT_CREDS}}}}
+
+# VV: NamedPackage does not modify the namespace presets or the payload, tests which do must use a copy
+_EMPTY_NS_PRESETS = apis.models.virtual_experiment.NamespacePresets()
+_EMPTY_PAYLOAD = apis.models.virtual_experiment.PayloadExecutionOptions()
+
+
+def _payload(**overrides) -> apis.models.virtual_experiment.PayloadExecutionOptions:
+    """Returns a copy of the default payload with some of its top-level fields replaced"""
+    payload = _EMPTY_PAYLOAD.copy(deep=True)
+    for name, value in overrides.items():
+        setattr(payload, name, value)
+    return payload
+
+
+def _ns_with_args(args: Sequence[str]) -> apis.models.virtual_experiment.NamespacePresets:
+    """Returns a copy of the default namespace presets with the runtime arguments @args"""
+    namespace_presets = _EMPTY_NS_PRESETS.copy(deep=True)
+    namespace_presets.runtime.args = list(args)
+    return namespace_presets
+
+
+def _payload_with_args(args: Sequence[str]) -> apis.models.virtual_experiment.PayloadExecutionOptions:
+    """Returns a copy of the default payload with the runtime arguments @args"""
+    return _payload(runtime=apis.models.virtual_experiment.ParameterisationRuntime(args=list(args)))
+
+
+# VV: Runtime arguments which tests share, the helpers above copy them into lists
+_ARGS_MEMO_YES = ('--useMemoization=yes',)
+_ARGS_MEMO_NO = ('--useMemoization=no',)
+_ARGS_HELLO = ('--hello',)
+
+_NS_MEMO_YES = _ns_with_args(_ARGS_MEMO_YES)
+_PAYLOAD_HELLO = _payload_with_args(_ARGS_HELLO)
+
+# VV: Payloads of individual tests, validated once when the module loads. Tests must not modify them
+_PAYLOAD_VOLUMES = apis.models.virtual_experiment.PayloadExecutionOptions.parse_obj({
+    'runtime': {
+        'args':
+            ['--hello']
+    },
+    'volumes': [
+        {
+            'applicationDependency': 'dep-pvc',
+            'type': {
+                'persistentVolumeClaim': {
+                    'claimName': 'pvc',
+                    'subPath': 'my custom subpath',
+                    'readOnly': False,
+                }
+            }
+        },
+        {
+            'applicationDependency': 'dep-secret',
+            'type': {
+                'secret': {
+                    'name': 'secret'
+                }
+            }
+        },
+    ]
+})
+
+_PAYLOAD_S3_DATA = apis.models.virtual_experiment.PayloadExecutionOptions.parse_obj({
+    **_SECURITY_S3_INPUT,
+    'data': [
+        {
+            'name': 'cat_me.txt',
+            'valueFrom': {
+                's3Ref': {
+                    "path": "some/path/cat_me.txt"
+                }
+            }
+        }
+    ],
+})
+
+_PAYLOAD_DATASET_OUTPUT = apis.models.virtual_experiment.PayloadExecutionOptions.parse_obj({
+    's3Output': {
+        'valueFrom':
+            {
+                'datasetRef': {
+                    'name': 'replace me',
+                    'path': 'location',
+                }
+            }
+    },
+    'security': {
+        's3Output': {
+            'valueFrom': {
+                'datasetRef': {
+                    "name": 'replace me'
+                }
+            }
+        }
+    }
+})
+
+
+_EXPECTED_GIT_PACKAGE = {
+    'branch': 'main',
+    'url': 'https://github.ibm.com/st4sd/sum-numbers.git',
+    'fromPath': None,
+    'withManifest': None
+}
+
+_EXPECTED_S3_PACKAGE = {
+    'fromPath': 'experiments/http-sum-numbers',
+    's3': {
+        'bucket': {'value': 'a-bucket'},
+        'endpoint': {'value': 'https://my.endpoint'},
+        'region': {'value': 'region'},
+        'accessKeyID': {
+            'valueFrom': {
+                'secretKeyRef': {
+                    'key': 'S3_ACCESS_KEY_ID',
+                    'name': 'default-s3-secret'
+                }
+            }
+        },
+        'secretAccessKey': {
+            'valueFrom': {
+                'secretKeyRef': {
+                    'key': 'S3_SECRET_ACCESS_KEY',
+                    'name': 'default-s3-secret'
+                }
+            }
+        }
+    }
+}
+
+
+# VV: The fields of the Workflow spec which do not depend on the package or the payload, tests must not modify them
+_EXPECTED_SPEC_DEFAULTS = {
+    'data': [],
+    'image': 'res-st4sd-team-official-base-docker-local.artifactory.swg-devops.com/st4sd-runtime-core',
+    'imagePullSecrets': [],
+    'inputs': [],
+    'resources': {'elaunchPrimary': {'cpu': '1', 'memory': '1Gi'}},
+    'variables': [],
+    'volumeMounts': [],
+    'volumes': [],
+}
+
+
+def _expected_workflow_spec(
+        package: apis.runtime.package.NamedPackage,
+        ve: apis.models.virtual_experiment.ParameterisedPackage,
+        name: str,
+        spec_package: Dict[str, Any],
+        data: List[str] | None = None,
+        volumes: List[Dict[str, Any]] | None = None,
+        volume_mounts: List[Dict[str, Any]] | None = None,
+        extra_spec: Dict[str, Any] | None = None,
+) -> Dict[str, Any]:
+    """Returns the Workflow that NamedPackage.construct_k8s_workflow() is expected to generate
+
+    Args:
+        package: The package that generated the Workflow
+        ve: The parameterised virtual experiment package that the @package wraps
+        name: The name of the Workflow object
+        spec_package: The expected contents of spec.package
+        data: The expected contents of spec.data
+        volumes: The expected contents of spec.volumes
+        volume_mounts: The expected contents of spec.volumeMounts
+        extra_spec: Any additional fields in spec
+    """
+    # VV: Some of these are properties which generate their values (e.g. runtime_args), read each one just once
+    rest_uid = package.rest_uid
+    # VV: This contains a timestamp
+    instance_dir_name = f"{package.instance_name}.instance"
+
+    spec = {
+        **_EXPECTED_SPEC_DEFAULTS,
+        'additionalOptions': package.runtime_args,
+        'env': [{'name': 'INSTANCE_DIR_NAME', 'value': instance_dir_name}],
+        'package': spec_package,
+        'workingVolume': {'name': 'working-volume',
+                          'persistentVolumeClaim': {'claimName': package.pvc_working_volume}},
+    }
+    for key, value in (('data', data), ('volumes', volumes), ('volumeMounts', volume_mounts)):
+        if value:
+            spec[key] = value
+    spec.update(extra_spec or {})
+
+    expected = {'apiVersion': 'st4sd.ibm.com/v1alpha1',
+                'kind': 'Workflow',
+                'metadata': {'labels': {'rest-uid': rest_uid,
+                                        'workflow': rest_uid,
+                                        'st4sd-package-name': ve.metadata.package.name,
+                                        'st4sd-package-digest': ve.metadata.registry.digest},
+                             'name': name},
+                'spec': spec}
+
+    return expected
+
+
+def _assert_workflow_spec(spec: Dict[str, Any], expected: Dict[str, Any]):
+    """Compares a Workflow to the expected one field by field so that failures point to the offending field"""
+    assert spec['apiVersion'] == expected['apiVersion']
+    assert spec['kind'] == expected['kind']
+    assert spec['metadata'] == expected['metadata']
+
+    assert sorted(spec['spec']) == sorted(expected['spec'])
+    for name, value in expected['spec'].items():
+        assert spec['spec'][name] == value, f"Unexpected spec.{name}"
+
+    assert sorted(spec) == sorted(expected)
+
+
+# VV: Maps the fields of s3BucketInput.bucketInfo to the keys of the Secret that holds their values
+_S3_IN_ENV_KEYS = {
+    'bucket': 'ST4SD_S3_IN_BUCKET',
+    'endpoint': 'ST4SD_S3_IN_END_POINT',
+    'accessKeyID': 'ST4SD_S3_IN_ACCESS_KEY_ID',
+    'secretAccessKey': 'ST4SD_S3_IN_SECRET_ACCESS_KEY',
+}
+
+
+# VV: The env-vars that hold the S3 output credentials, sorted just like the env of a Workflow
+_S3_OUT_ENV_KEYS = ('S3_ACCESS_KEY_ID', 'S3_END_POINT', 'S3_SECRET_ACCESS_KEY')
+_S3_OUT_ENV_KEY_SET = frozenset(_S3_OUT_ENV_KEYS)
+
+
+def _s3_secret_refs(secret_name: str, keys: Dict[str, str] = _S3_IN_ENV_KEYS) -> Dict[str, Any]:
+    """Returns the expected s3BucketInput.bucketInfo of a Workflow whose S3 input credentials are in @secret_name"""
+    return {
+        label: {'valueFrom': {'secretKeyRef': {'name': secret_name, 'key': key}}}
+        for label, key in keys.items()
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def _pkg_ident(name: str, digest: str) -> str:
+    """Returns the identifier of the package ${name}@${digest}"""
+    return apis.models.common.PackageIdentifier.from_parts(package_name=name, tag=None, digest=digest).identifier
+
+
+def _short_digest(ve: apis.models.virtual_experiment.ParameterisedPackage) -> str:
+    # VV: Digest format is "${digest algorithm}x", find the first x (delimiter) and keep 6 chars after that
+    return ve.metadata.registry.digest.partition('x')[2][:6]
+
+
+def _pop_workflow_name_suffix(spec: Dict[str, Any], ve: apis.models.virtual_experiment.ParameterisedPackage) -> str:
+    """Asserts that the Workflow is named after the package and its digest then removes the random suffix of the name
+
+    Returns:
+        The name of the Workflow without the random suffix
+    """
+    constructed_name = f"{ve.metadata.package.name}-{_short_digest(ve)}"
+    assert spec['metadata']['name'].rsplit('-', 1)[0] == constructed_name
+
+    spec['metadata']['name'] = constructed_name
+    return constructed_name
+
+
+@pytest.fixture(scope="session")
+def s3_db_secrets(
+    tmp_path_factory: pytest.TempPathFactory,
+) -> Tuple[apis.db.secrets.DatabaseSecrets, apis.models.virtual_experiment.BasePackageSourceS3]:
+    """A secrets database containing the default-s3-secret, and the S3 package source that it generates
+
+    Tests must treat both objects as read-only because they are shared for the entire session.
+    """
+    # VV: Only the S3 tests need the (expensive to import) internal experiments kernel
+    import apis.kernel.internal_experiments
+
+    # VV: Echo the steps that the runtime-service follows to generate the base package for an internal experiment
+    db_secrets = apis.db.secrets.DatabaseSecrets(db_path=str(tmp_path_factory.mktemp("secrets") / "secrets.db"))
+
+    with db_secrets:
+        db_secrets.secret_create(
+            apis.db.secrets.Secret(
+                name="default-s3-secret",
+                data={
+                    "S3_BUCKET": "a-bucket",
+                    "S3_ENDPOINT": "https://my.endpoint",
+                    "S3_ACCESS_KEY_ID": "access-key-id",
+                    "S3_SECRET_ACCESS_KEY": "secret-access-key",
+                    "S3_REGION": "region"
+                }
+            )
+        )
+
+    package_source = apis.kernel.internal_experiments.generate_s3_package_source_from_secret(
+        secret_name="default-s3-secret",
+        db_secrets=db_secrets
+    )
+
+    return db_secrets, package_source
+
+
+@pytest.fixture(scope="module")
+def make_named_package(
+        ve_sum_numbers_readonly: apis.models.virtual_experiment.ParameterisedPackage
+) -> Callable[[Dict[str, Any]], apis.runtime.package.NamedPackage]:
+    """Returns a factory of NamedPackage objects for ve_sum_numbers_readonly and the default namespace presets
+
+    The factory accepts the payload as a dictionary and caches the packages it builds, tests must not modify them.
+    """
+
+    @functools.lru_cache(maxsize=None)
+    def build(payload: str) -> apis.runtime.package.NamedPackage:
+        return apis.runtime.package.NamedPackage(
+            ve_sum_numbers_readonly,
+            _EMPTY_NS_PRESETS,
+            apis.models.virtual_experiment.PayloadExecutionOptions.model_validate_json(payload))
+
+    def factory(payload: Dict[str, Any]) -> apis.runtime.package.NamedPackage:
+        return build(json.dumps(payload, sort_keys=True))
+
+    return factory
+
+
+@pytest.fixture(scope="module")
+def sum_numbers_experiment_name(ve_sum_numbers_readonly: apis.models.virtual_experiment.ParameterisedPackage) -> str:
+    """Returns the experiment name that NamedPackage generates for ve_sum_numbers_readonly"""
+    return f"{ve_sum_numbers_readonly.metadata.package.name}-{_short_digest(ve_sum_numbers_readonly)}"
+
+
+@pytest.fixture(scope="module")
+def payload_from_deprecated() -> Callable[[Dict[str, Any]], apis.models.virtual_experiment.PayloadExecutionOptions]:
+    """Returns a function which converts a deprecated experiment start payload into a PayloadExecutionOptions
+
+    The function accepts the deprecated payload as a dictionary and caches its results, tests must not modify them.
+    """
+
+    @functools.lru_cache(maxsize=None)
+    def convert(experiment_start_obj: str) -> apis.models.virtual_experiment.PayloadExecutionOptions:
+        deprecated = apis.models.virtual_experiment.DeprecatedExperimentStartPayload.model_validate_json(
+            experiment_start_obj)
+        return apis.models.virtual_experiment.PayloadExecutionOptions.from_old_payload(deprecated)
+
+    def factory(experiment_start_obj: Dict[str, Any]) -> apis.models.virtual_experiment.PayloadExecutionOptions:
+        return convert(json.dumps(experiment_start_obj, sort_keys=True))
+
+    return factory
+
+
+@pytest.fixture(scope="session")
+def psi4_package_location(tmp_path_factory: pytest.TempPathFactory, flowir_psi4: str) -> str:
+    """Returns the path to a psi4 package on the local filesystem, tests must not modify it"""
+    return package_from_files(
+        location=str(tmp_path_factory.mktemp("psi4")),
+        files={
+            'bin/aggregate_energies.py': 'expensive',
+            'bin/optimize_ff.py': 'expensive',
+            'bin/optimize_psi4.py': 'expensive',
+
+            'conf/flowir_package.yaml': flowir_psi4,
+        }
+    )
+
+
+@pytest.fixture(scope="session")
+def psi4_storage_metadata(psi4_package_location: str) -> apis.models.virtual_experiment.StorageMetadata:
+    """Returns the StorageMetadata of the psi4 package, tests must not modify it"""
+    return apis.models.virtual_experiment.StorageMetadata.from_config(
+        prefix_paths=psi4_package_location, config=apis.models.virtual_experiment.BasePackageConfig(),
+    )
+
+
 # VV: fixture in conftest
 def test_no_override_namespace_by_package(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
     ve_sum_numbers.parameterisation.executionOptions.runtime.args.append('--helloFromExecutionOptions')
 
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets.parse_obj({
-        'runtime': {
-            'args':
-                ['--useMemoization=yes']
-        }
-    })
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.parse_obj({
-        'runtime': {
-            'args':
-                ['--hello']
-        }
-    })
-    package = apis.runtime.package.NamedPackage(ve_sum_numbers, namespace_presets, payload_config)
+    package = apis.runtime.package.NamedPackage(ve_sum_numbers, _NS_MEMO_YES, _PAYLOAD_HELLO)
 
-    assert [x for x in package.runtime_args if x.startswith('--useMemoization=')] == ['--useMemoization=yes']
-    assert '--hello' in package.runtime_args
-    assert '--helloFromExecutionOptions' in package.runtime_args
+    runtime_args = package.runtime_args
+    assert [x for x in runtime_args if x.startswith('--useMemoization=')] == ['--useMemoization=yes']
+    assert '--hello' in runtime_args
+    assert '--helloFromExecutionOptions' in runtime_args
 
 
 def test_default_platform(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
     ve_sum_numbers.parameterisation.presets.platform = None
     ve_sum_numbers.parameterisation.executionOptions.platform = ['artifactory', 'default']
 
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions()
+    namespace_presets = _EMPTY_NS_PRESETS
+    payload_config = _EMPTY_PAYLOAD
     package = apis.runtime.package.NamedPackage(ve_sum_numbers, namespace_presets, payload_config)
 
     assert package.platform == "artifactory"
@@ -79,66 +474,48 @@ def test_default_platform(ve_sum_numbers: apis.models.virtual_experiment.Paramet
 def test_no_override_platform(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
     ve_sum_numbers.parameterisation.presets.platform = "hello"
 
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions()
+    namespace_presets = _EMPTY_NS_PRESETS
+    payload_config = _EMPTY_PAYLOAD
     package = apis.runtime.package.NamedPackage(ve_sum_numbers, namespace_presets, payload_config)
 
     assert package.platform == "hello"
 
 
-def test_override_platform_config(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions()
-
-    payload_config.platform = "default"
-    package = apis.runtime.package.NamedPackage(ve_sum_numbers, namespace_presets, payload_config)
+def test_override_platform_config(ve_sum_numbers_readonly: apis.models.virtual_experiment.ParameterisedPackage):
+    namespace_presets = _EMPTY_NS_PRESETS
+    payload_config = _payload(platform="default")
+    package = apis.runtime.package.NamedPackage(ve_sum_numbers_readonly, namespace_presets, payload_config)
 
     assert package.platform == "default"
 
 
-# VV: fixture in conftest
-def test_error_override_namespace_by_package_presets(
-        ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets.parse_obj({
-        'runtime': {
-            'args':
-                ['--useMemoization=yes']
-        }
-    })
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.parse_obj({
-        'runtime': {
-            'args':
-                ['--hello']
-        }
-    })
-
-    ve_sum_numbers.parameterisation.presets.runtime.args = ['--useMemoization=no']
-
-    with pytest.raises(apis.models.errors.InvalidElaunchParameterChoices) as e:
-        apis.runtime.package.NamedPackage(ve_sum_numbers, namespace_presets, payload_config)
-
-    assert e.value.name == "useMemoization"
-    # VV: This is the value that we are trying to override - not the one we tried to use
-    assert e.value.valid_values == [True]
-
-
-def test_error_override_namespace_by_package_execution_options(
-        ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage
+@pytest.mark.parametrize(
+    "namespace_args,ve_runtime,ve_args,payload_args", [
+        (_ARGS_MEMO_YES, "parameterisation.presets.runtime", _ARGS_MEMO_NO, _ARGS_HELLO),
+        (_ARGS_MEMO_YES, "parameterisation.executionOptions.runtime", _ARGS_MEMO_NO, _ARGS_HELLO),
+        (_ARGS_MEMO_YES, None, None, _ARGS_MEMO_NO),
+        ((), "parameterisation.presets.runtime", _ARGS_MEMO_YES, _ARGS_MEMO_NO),
+        ((), "parameterisation.executionOptions.runtime", _ARGS_MEMO_YES, _ARGS_MEMO_NO),
+    ], ids=[
+        "namespace_by_package_presets",
+        "namespace_by_package_execution_options",
+        "namespace_by_payload",
+        "package_preset_by_payload",
+        "package_execution_options_by_payload",
+    ]
+)
+def test_error_override_use_memoization(
+        namespace_args: Tuple[str, ...],
+        ve_runtime: str | None,
+        ve_args: Tuple[str, ...] | None,
+        payload_args: Tuple[str, ...],
+        ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage,
 ):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets.parse_obj({
-        'runtime': {
-            'args':
-                ['--useMemoization=yes']
-        }
-    })
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.parse_obj({
-        'runtime': {
-            'args':
-                ['--hello']
-        }
-    })
+    namespace_presets = _ns_with_args(namespace_args)
+    payload_config = _payload_with_args(payload_args)
 
-    ve_sum_numbers.parameterisation.executionOptions.runtime.args = ['--useMemoization=no']
+    if ve_runtime is not None:
+        operator.attrgetter(ve_runtime)(ve_sum_numbers).args = list(ve_args)
 
     with pytest.raises(apis.models.errors.InvalidElaunchParameterChoices) as e:
         apis.runtime.package.NamedPackage(ve_sum_numbers, namespace_presets, payload_config)
@@ -151,9 +528,9 @@ def test_error_override_namespace_by_package_execution_options(
 def test_error_override_resources_namespace_by_package_execution_options(
         ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage
 ):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
+    namespace_presets = _EMPTY_NS_PRESETS.copy(deep=True)
     namespace_presets.runtime.resources.memory = "1Gi"
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions()
+    payload_config = _EMPTY_PAYLOAD
 
     ve_sum_numbers.parameterisation.executionOptions.runtime.resources.cpu = None
     ve_sum_numbers.parameterisation.executionOptions.runtime.resources.memory = "10Gi"
@@ -166,97 +543,11 @@ def test_error_override_resources_namespace_by_package_execution_options(
     assert e.value.overridden_key == "namespace.runtime.resources.memory"
 
 
-# VV: fixture in conftest
-def test_error_override_namespace_by_payload(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets.parse_obj({
-        'runtime': {
-            'args':
-                ['--useMemoization=yes']
-        }
-    })
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.parse_obj({
-        'runtime': {
-            'args':
-                ['--useMemoization=no']
-        }
-    })
-
-    with pytest.raises(apis.models.errors.InvalidElaunchParameterChoices) as e:
-        apis.runtime.package.NamedPackage(ve_sum_numbers, namespace_presets, payload_config)
-
-    assert e.value.name == "useMemoization"
-    # VV: This is the value that we are trying to override - not the one we tried to use
-    assert e.value.valid_values == [True]
-
-
-def test_error_override_package_preset_by_payload(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets.parse_obj({})
-    ve_sum_numbers.parameterisation.presets.runtime.args = ['--useMemoization=yes']
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.parse_obj({
-        'runtime': {
-            'args':
-                ['--useMemoization=no']
-        }
-    })
-
-    with pytest.raises(apis.models.errors.InvalidElaunchParameterChoices) as e:
-        apis.runtime.package.NamedPackage(ve_sum_numbers, namespace_presets, payload_config)
-
-    assert e.value.name == "useMemoization"
-    # VV: This is the value that we are trying to override - not the one we tried to use
-    assert e.value.valid_values == [True]
-
-
-def test_error_override_package_execution_options_by_payload(
-        ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets.parse_obj({})
-    ve_sum_numbers.parameterisation.executionOptions.runtime.args = ['--useMemoization=yes']
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.parse_obj({
-        'runtime': {
-            'args':
-                ['--useMemoization=no']
-        }
-    })
-
-    with pytest.raises(apis.models.errors.InvalidElaunchParameterChoices) as e:
-        apis.runtime.package.NamedPackage(ve_sum_numbers, namespace_presets, payload_config)
-
-    assert e.value.name == "useMemoization"
-    # VV: This is the value that we are trying to override - not the one we tried to use
-    assert e.value.valid_values == [True]
-
-
-def test_decode_payload_volume(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets.parse_obj({})
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.parse_obj({
-        'runtime': {
-            'args':
-                ['--hello']
-        },
-        'volumes': [
-            {
-                'applicationDependency': 'dep-pvc',
-                'type': {
-                    'persistentVolumeClaim': {
-                        'claimName': 'pvc',
-                        'subPath': 'my custom subpath',
-                        'readOnly': False,
-                    }
-                }
-            },
-            {
-                'applicationDependency': 'dep-secret',
-                'type': {
-                    'secret': {
-                        'name': 'secret'
-                    }
-                }
-            },
-
-        ]
-    })
+def test_decode_payload_volume(ve_sum_numbers_readonly: apis.models.virtual_experiment.ParameterisedPackage):
+    namespace_presets = _EMPTY_NS_PRESETS
+    payload_config = _PAYLOAD_VOLUMES
     package = apis.runtime.package.NamedPackage(
-        ve_sum_numbers,
+        ve_sum_numbers_readonly,
         namespace_presets,
         payload_config)
 
@@ -286,7 +577,7 @@ def test_decode_payload_volume(ve_sum_numbers: apis.models.virtual_experiment.Pa
     assert volume_mounts[0].volume_name == 'volume0'
     assert volume_mounts[0].config == {
         'name': 'volume0',
-        'mountPath': os.path.join(apis.runtime.package.ROOT_VOLUME_MOUNTS, 'pvc'),
+        'mountPath': _MOUNT_PVC,
         'readOnly': False,
         'subPath': 'my custom subpath'
     }
@@ -294,29 +585,22 @@ def test_decode_payload_volume(ve_sum_numbers: apis.models.virtual_experiment.Pa
     assert volume_mounts[1].volume_name == "volume1"
     assert volume_mounts[1].config == {
         'name': 'volume1',
-        'mountPath': os.path.join(apis.runtime.package.ROOT_VOLUME_MOUNTS, 'secret'),
+        'mountPath': _MOUNT_SECRET,
         'readOnly': True,
     }
 
-    args = package.runtime_args
+    args = set(package.runtime_args)
 
-    args.index(f'--applicationDependencySource=dep-pvc:{os.path.join(apis.runtime.package.ROOT_VOLUME_MOUNTS, "pvc")}')
-    args.index(f'--applicationDependencySource=dep-secret:'
-               f'{os.path.join(apis.runtime.package.ROOT_VOLUME_MOUNTS, "secret")}')
+    assert f'--applicationDependencySource=dep-pvc:{_MOUNT_PVC}' in args
+    assert f'--applicationDependencySource=dep-secret:{_MOUNT_SECRET}' in args
 
 
-def test_environment_variables(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.parse_obj({
-        'environmentVariables': [
-            {
-                'name': 'hello',
-                'value': 'world',
-            }
-        ]
-    })
+def test_environment_variables(ve_sum_numbers_readonly: apis.models.virtual_experiment.ParameterisedPackage):
+    namespace_presets = _EMPTY_NS_PRESETS
+    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.model_construct(
+        environmentVariables=[apis.models.common.Option(name='hello', value='world')])
     package = apis.runtime.package.NamedPackage(
-        ve_sum_numbers,
+        ve_sum_numbers_readonly,
         namespace_presets,
         payload_config)
 
@@ -332,15 +616,9 @@ def test_environment_variables(ve_sum_numbers: apis.models.virtual_experiment.Pa
 
 
 def test_workflow_variables_unbounded(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.parse_obj({
-        'variables': [
-            {
-                'name': 'hello',
-                'value': 'world',
-            }
-        ]
-    })
+    namespace_presets = _EMPTY_NS_PRESETS
+    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.model_construct(
+        variables=[apis.models.common.Option(name='hello', value='world')])
 
     ve_sum_numbers.parameterisation.executionOptions.variables = [
         apis.models.common.OptionMany.parse_obj({
@@ -360,27 +638,19 @@ def test_workflow_variables_unbounded(ve_sum_numbers: apis.models.virtual_experi
         'hello': 'world'
     }
 
-    str_variables = yaml.dump({
+    embedded_files = package.embedded_files
+    assert list(embedded_files) == ['input/st4sd-variables.yaml']
+    assert yaml.load(embedded_files['input/st4sd-variables.yaml'], Loader=_SafeLoader) == {
         'global': {
             'hello': 'world'
         }
-    })
-
-    assert package.embedded_files == {
-        'input/st4sd-variables.yaml': str_variables
     }
 
 
 def test_workflow_variables_not_in_choices(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.parse_obj({
-        'variables': [
-            {
-                'name': 'hello',
-                'value': 'world',
-            }
-        ]
-    })
+    namespace_presets = _EMPTY_NS_PRESETS
+    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.model_construct(
+        variables=[apis.models.common.Option(name='hello', value='world')])
 
     ve_sum_numbers.parameterisation.executionOptions.variables = [
         apis.models.common.OptionMany(name='hello', valueFrom=[
@@ -399,15 +669,9 @@ def test_workflow_variables_not_in_choices(ve_sum_numbers: apis.models.virtual_e
 
 
 def test_workflow_variables_in_choices(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.parse_obj({
-        'variables': [
-            {
-                'name': 'hello',
-                'value': 'world',
-            }
-        ]
-    })
+    namespace_presets = _EMPTY_NS_PRESETS
+    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.model_construct(
+        variables=[apis.models.common.Option(name='hello', value='world')])
 
     ve_sum_numbers.parameterisation.executionOptions.variables = [
         apis.models.common.OptionMany(name='hello', valueFrom=[
@@ -425,8 +689,8 @@ def test_workflow_variables_in_choices(ve_sum_numbers: apis.models.virtual_exper
 
 
 def test_workflow_variables_default_choices(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions()
+    namespace_presets = _EMPTY_NS_PRESETS
+    payload_config = _EMPTY_PAYLOAD
 
     ve_sum_numbers.parameterisation.executionOptions.variables = [
         apis.models.common.OptionMany(name='hello', valueFrom=[
@@ -445,8 +709,8 @@ def test_workflow_variables_default_choices(ve_sum_numbers: apis.models.virtual_
 
 def test_workflow_variables_default_choices_from_value(
         ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions()
+    namespace_presets = _EMPTY_NS_PRESETS
+    payload_config = _EMPTY_PAYLOAD
 
     ve_sum_numbers.parameterisation.executionOptions.variables = [
         apis.models.common.OptionMany(name='hello', value="not-world")
@@ -459,20 +723,14 @@ def test_workflow_variables_default_choices_from_value(
     assert package.workflow_variables['hello'] == 'not-world'
 
 
-def test_workflow_variables_not_allowed(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.parse_obj({
-        'variables': [
-            {
-                'name': 'hello',
-                'value': 'world',
-            }
-        ]
-    })
+def test_workflow_variables_not_allowed(ve_sum_numbers_readonly: apis.models.virtual_experiment.ParameterisedPackage):
+    namespace_presets = _EMPTY_NS_PRESETS
+    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.model_construct(
+        variables=[apis.models.common.Option(name='hello', value='world')])
 
     with pytest.raises(apis.models.errors.OverrideVariableError) as e:
         _ = apis.runtime.package.NamedPackage(
-            ve_sum_numbers,
+            ve_sum_numbers_readonly,
             namespace_presets,
             payload_config)
 
@@ -481,27 +739,21 @@ def test_workflow_variables_not_allowed(ve_sum_numbers: apis.models.virtual_expe
 
 
 def test_workflow_data_files(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.parse_obj({
-        'data': [
-            {
-                'name': 'hello',
-                'value': 'world',
-            }
-        ]
-    })
+    namespace_presets = _EMPTY_NS_PRESETS
+    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.model_construct(
+        data=[apis.models.common.Option(name='hello', value='world')])
 
     ve_sum_numbers.parameterisation.presets.data = [
-        apis.models.common.Option.parse_obj({'name': 'not-hello', 'value': 'default-not-hello'})
+        apis.models.common.Option.model_construct(name='not-hello', value='default-not-hello')
     ]
 
     ve_sum_numbers.parameterisation.executionOptions.data = [
-        apis.models.common.OptionMany.parse_obj({'name': 'hello'}),
-        apis.models.common.OptionMany.parse_obj({'name': 'not-hello'})
+        apis.models.common.OptionMany.model_construct(name='hello'),
+        apis.models.common.OptionMany.model_construct(name='not-hello')
     ]
 
     ve_sum_numbers.parameterisation.presets.variables = [
-        apis.models.common.Option.parse_obj({'name': 'variable', 'value': 'value'})
+        apis.models.common.Option.model_construct(name='variable', value='value')
     ]
 
     package = apis.runtime.package.NamedPackage(
@@ -509,16 +761,18 @@ def test_workflow_data_files(ve_sum_numbers: apis.models.virtual_experiment.Para
         namespace_presets,
         payload_config)
 
-    str_yaml = yaml.dump({
+    embedded_files = package.embedded_files
+    str_variables = embedded_files['input/st4sd-variables.yaml']
+    assert yaml.load(str_variables, Loader=_SafeLoader) == {
         'global': {
             'variable': 'value',
         }
-    })
+    }
 
-    assert package.embedded_files == {
+    assert embedded_files == {
         'data/hello': 'world',
         'data/not-hello': 'default-not-hello',
-        'input/st4sd-variables.yaml': str_yaml,
+        'input/st4sd-variables.yaml': str_variables,
     }
 
     configmap = package.construct_k8s_configmap_embedded_files("something")
@@ -528,24 +782,18 @@ def test_workflow_data_files(ve_sum_numbers: apis.models.virtual_experiment.Para
     assert configmap['data'] == {
         'hello': 'world',
         'not-hello': 'default-not-hello',
-        'st4sd-variables.yaml': str_yaml,
+        'st4sd-variables.yaml': str_variables,
     }
 
 
 def test_workflow_data_no_override_presets(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.parse_obj({
-        'data': [
-            {
-                'name': 'hello',
-                'value': 'world',
-            }
-        ]
-    })
+    namespace_presets = _EMPTY_NS_PRESETS
+    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.model_construct(
+        data=[apis.models.common.Option(name='hello', value='world')])
 
     ve_sum_numbers.parameterisation.presets.data = [
-        apis.models.common.Option.parse_obj({'name': 'hello', 'value': 'default-hello'}),
-        apis.models.common.Option.parse_obj({'name': 'not-hello', 'value': 'default-not-hello'})
+        apis.models.common.Option.model_construct(name='hello', value='default-hello'),
+        apis.models.common.Option.model_construct(name='not-hello', value='default-not-hello')
     ]
 
     with pytest.raises(apis.models.errors.OverrideDataFilesError) as e:
@@ -558,18 +806,12 @@ def test_workflow_data_no_override_presets(ve_sum_numbers: apis.models.virtual_e
 
 
 def test_workflow_data_no_matching_execopts(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.parse_obj({
-        'data': [
-            {
-                'name': 'hello',
-                'value': 'world',
-            }
-        ]
-    })
+    namespace_presets = _EMPTY_NS_PRESETS
+    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.model_construct(
+        data=[apis.models.common.Option(name='hello', value='world')])
 
     ve_sum_numbers.parameterisation.presets.data = [
-        apis.models.common.Option.parse_obj({'name': 'not-hello', 'value': 'default-not-hello'})
+        apis.models.common.Option.model_construct(name='not-hello', value='default-not-hello')
     ]
 
     with pytest.raises(apis.models.errors.OverrideDataFilesError) as e:
@@ -636,7 +878,8 @@ def test_decode_experiment_start_payload():
 
     assert len(volumes) == 2
 
-    print(volumes[0].dict())
+    if _VERBOSE:
+        print(volumes[0].dict())
 
     assert volumes[0].type.dict() == {
         'persistentVolumeClaim': {
@@ -652,92 +895,39 @@ def test_decode_experiment_start_payload():
     }
 
 
-def test_package_workflow_git_plain(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.parse_obj({})
+def test_package_workflow_git_plain(ve_sum_numbers_readonly: apis.models.virtual_experiment.ParameterisedPackage):
+    namespace_presets = _EMPTY_NS_PRESETS
+    payload_config = _EMPTY_PAYLOAD
     package = apis.runtime.package.NamedPackage(
-        ve_sum_numbers,
+        ve_sum_numbers_readonly,
         namespace_presets,
         payload_config)
 
     spec = package.construct_k8s_workflow()
 
-    print(yaml.dump(spec))
-
-    # VV: Digest format is "${digest algorithm}x", find the first x (delimiter) and keep 6 chars after that
-    digest = ve_sum_numbers.metadata.registry.digest.split('x', 1)[1][:6]
-    constructed_name = f"{ve_sum_numbers.metadata.package.name}-{digest}"
-    assert spec['metadata']['name'].rsplit('-', 1)[0] == constructed_name
-
-    spec['metadata']['name'] = constructed_name
+    _debug_spec(spec)
 
-    # VV: This contains a timestamp
-    instance_dir_name = f"{package.instance_name}.instance"
-
-    assert spec == {'apiVersion': 'st4sd.ibm.com/v1alpha1',
-                    'kind': 'Workflow',
-                    'metadata': {'labels': {'rest-uid': package.rest_uid,
-                                            'workflow': package.rest_uid,
-                                            'st4sd-package-name': ve_sum_numbers.metadata.package.name,
-                                            'st4sd-package-digest': ve_sum_numbers.metadata.registry.digest},
-                                 'name': constructed_name},
-                    'spec': {'additionalOptions': package.runtime_args,
-                             'data': [],
-                             'env': [{'name': 'INSTANCE_DIR_NAME',
-                                      'value': instance_dir_name}],
-                             'image': 'res-st4sd-team-official-base-docker-local.artifactory.'
-                                      'swg-devops.com/st4sd-runtime-core',
-                             'imagePullSecrets': [],
-                             'inputs': [],
-                             'package': {'branch': 'main',
-                                         'url': 'https://github.ibm.com/st4sd/sum-numbers.git',
-                                         'fromPath': None,
-                                         'withManifest': None},
-                             'resources': {'elaunchPrimary': {'cpu': '1', 'memory': '1Gi'}},
-                             'variables': [],
-                             'volumeMounts': [],
-                             'volumes': [],
-                             'workingVolume': {'name': 'working-volume',
-                                               'persistentVolumeClaim': {'claimName': package.pvc_working_volume}}
-                             }}
+    constructed_name = _pop_workflow_name_suffix(spec, ve_sum_numbers_readonly)
 
+    _assert_workflow_spec(spec, _expected_workflow_spec(
+        package=package, ve=ve_sum_numbers_readonly, name=constructed_name, spec_package=_EXPECTED_GIT_PACKAGE))
 
 
 def test_package_workflow_s3_plain(
     ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage,
-    output_dir: str,
+    s3_db_secrets: Tuple[apis.db.secrets.DatabaseSecrets, apis.models.virtual_experiment.BasePackageSourceS3],
 ):
-    ve_sum_numbers = ve_sum_numbers.copy(deep=True)
-
-    # VV: Echo the steps that the runtime-service follows to generate the base package for an internal experiment
-    db_secrets = apis.db.secrets.DatabaseSecrets(db_path=os.path.join(output_dir, "secrets.db"))
-
-    with db_secrets:
-        db_secrets.secret_create(
-            apis.db.secrets.Secret(
-                name="default-s3-secret",
-                data={
-                    "S3_BUCKET": "a-bucket",
-                    "S3_ENDPOINT": "https://my.endpoint",
-                    "S3_ACCESS_KEY_ID": "access-key-id",
-                    "S3_SECRET_ACCESS_KEY": "secret-access-key",
-                    "S3_REGION": "region"
-                }
-            )
-        )
+    # VV: The s3_db_secrets fixture imports apis.kernel.internal_experiments
+    _, package_source = s3_db_secrets
 
-    package_source = apis.kernel.internal_experiments.generate_s3_package_source_from_secret(
-        secret_name="default-s3-secret",
-        db_secrets=db_secrets
-    )
     ve_sum_numbers = apis.kernel.internal_experiments.point_base_package_to_s3_storage(
         pvep=ve_sum_numbers,
         credentials=package_source.security.credentials,
         location=package_source.location,
     )
 
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.parse_obj({})
+    namespace_presets = _EMPTY_NS_PRESETS
+    payload_config = _EMPTY_PAYLOAD
     package = apis.runtime.package.NamedPackage(
         ve_sum_numbers,
         namespace_presets,
@@ -745,73 +935,19 @@ def test_package_workflow_s3_plain(
 
     spec = package.construct_k8s_workflow()
 
-    print(yaml.dump(spec))
-
-    # VV: Digest format is "${digest algorithm}x", find the first x (delimiter) and keep 6 chars after that
-    digest = ve_sum_numbers.metadata.registry.digest.split('x', 1)[1][:6]
-    constructed_name = f"{ve_sum_numbers.metadata.package.name}-{digest}"
-    assert spec['metadata']['name'].rsplit('-', 1)[0] == constructed_name
-
-    spec['metadata']['name'] = constructed_name
-
-    # VV: This contains a timestamp
-    instance_dir_name = f"{package.instance_name}.instance"
+    _debug_spec(spec)
 
-    expected_package = {
-        'fromPath': 'experiments/http-sum-numbers',
-        's3': {
-            'bucket': {'value': 'a-bucket'},
-            'endpoint': {'value': 'https://my.endpoint'},
-            'region': {'value': 'region'},
-            'accessKeyID': {
-                'valueFrom': {
-                    'secretKeyRef': {
-                        'key': 'S3_ACCESS_KEY_ID',
-                        'name': 'default-s3-secret'
-                    }
-                }
-            },
-            'secretAccessKey': {
-                'valueFrom': {
-                    'secretKeyRef': {
-                        'key': 'S3_SECRET_ACCESS_KEY',
-                        'name': 'default-s3-secret'
-                    }
-                }
-            }
-        }
-    }
+    constructed_name = _pop_workflow_name_suffix(spec, ve_sum_numbers)
 
-    assert spec == {'apiVersion': 'st4sd.ibm.com/v1alpha1',
-                    'kind': 'Workflow',
-                    'metadata': {'labels': {'rest-uid': package.rest_uid,
-                                            'workflow': package.rest_uid,
-                                            'st4sd-package-name': ve_sum_numbers.metadata.package.name,
-                                            'st4sd-package-digest': ve_sum_numbers.metadata.registry.digest},
-                                 'name': constructed_name},
-                    'spec': {'additionalOptions': package.runtime_args,
-                             'data': [],
-                             'env': [{'name': 'INSTANCE_DIR_NAME',
-                                      'value': instance_dir_name}],
-                             'image': 'res-st4sd-team-official-base-docker-local.artifactory.'
-                                      'swg-devops.com/st4sd-runtime-core',
-                             'imagePullSecrets': [],
-                             'inputs': [],
-                             'package': expected_package,
-                             'resources': {'elaunchPrimary': {'cpu': '1', 'memory': '1Gi'}},
-                             'variables': [],
-                             'volumeMounts': [],
-                             'volumes': [],
-                             'workingVolume': {'name': 'working-volume',
-                                               'persistentVolumeClaim': {'claimName': package.pvc_working_volume}}
-                             }}
+    _assert_workflow_spec(spec, _expected_workflow_spec(
+        package=package, ve=ve_sum_numbers, name=constructed_name, spec_package=_EXPECTED_S3_PACKAGE))
 
 
 def test_package_workflow_dataset_plain(
         sum_numbers_ve_dataset: apis.models.virtual_experiment.ParameterisedPackage, mock_list_dataset
 ):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.parse_obj({})
+    namespace_presets = _EMPTY_NS_PRESETS
+    payload_config = _EMPTY_PAYLOAD
     package = apis.runtime.package.NamedPackage(
         sum_numbers_ve_dataset,
         namespace_presets,
@@ -819,60 +955,22 @@ def test_package_workflow_dataset_plain(
 
     spec = package.construct_k8s_workflow()
 
-    print(yaml.dump(spec))
+    _debug_spec(spec)
 
-    # VV: Digest format is "${digest algorithm}x", find the first x (delimiter) and keep 6 chars after that
-    digest = sum_numbers_ve_dataset.metadata.registry.digest.split('x', 1)[1][:6]
-    constructed_name = f"{sum_numbers_ve_dataset.metadata.package.name}-{digest}"
-    assert spec['metadata']['name'].rsplit('-', 1)[0] == constructed_name
+    constructed_name = _pop_workflow_name_suffix(spec, sum_numbers_ve_dataset)
 
-    spec['metadata']['name'] = constructed_name
-
-    # VV: This contains a timestamp
-    instance_dir_name = f"{package.instance_name}.instance"
-
-    assert spec == {
-        'apiVersion': 'st4sd.ibm.com/v1alpha1',
-        'kind': 'Workflow',
-        'metadata': {'labels': {'rest-uid': package.rest_uid,
-                                'workflow': package.rest_uid,
-                                'st4sd-package-name': sum_numbers_ve_dataset.metadata.package.name,
-                                'st4sd-package-digest': sum_numbers_ve_dataset.metadata.registry.digest},
-                     'name': constructed_name},
-        'spec': {'additionalOptions': package.runtime_args,
-                 'data': [],
-                 'env': [{'name': 'INSTANCE_DIR_NAME',
-                          'value': instance_dir_name}],
-                 'image': 'res-st4sd-team-official-base-docker-local.artifactory.'
-                          'swg-devops.com/st4sd-runtime-core',
-                 'imagePullSecrets': [],
-                 'inputs': [],
-                 'package': {'fromPath': "/tmp/st4sd-workflow-definitions/main", 'withManifest': None},
-                 'resources': {'elaunchPrimary': {'cpu': '1', 'memory': '1Gi'}},
-                 'variables': [],
-                 'volumeMounts': [
-                     {'mountPath': '/tmp/st4sd-workflow-definitions/main', 'name': 'base-main'}
-                 ],
-                 'volumes': [
-                     {
-                         'name': 'base-main',
-                         'persistentVolumeClaim': {'claimName': 'my-test'}}
-                 ],
-                 'workingVolume': {'name': 'working-volume',
-                                   'persistentVolumeClaim': {'claimName': package.pvc_working_volume}}
-                 }}
+    _assert_workflow_spec(spec, _expected_workflow_spec(
+        package=package, ve=sum_numbers_ve_dataset, name=constructed_name,
+        spec_package={'fromPath': "/tmp/st4sd-workflow-definitions/main", 'withManifest': None},
+        volume_mounts=[_VOL_MOUNT_BASE_MAIN],
+        volumes=[_VOL_BASE_MAIN],
+    ))
 
 
 def test_package_workflow_git_embedded_data(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.parse_obj({
-        'data': [
-            {
-                'name': 'cat_me.txt',
-                'value': 'custom message',
-            }
-        ]
-    })
+    namespace_presets = _EMPTY_NS_PRESETS
+    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.model_construct(
+        data=[apis.models.common.Option(name='cat_me.txt', value='custom message')])
 
     ve_sum_numbers.parameterisation.executionOptions.data = [
         apis.models.common.OptionMany.parse_obj({
@@ -887,149 +985,67 @@ def test_package_workflow_git_embedded_data(ve_sum_numbers: apis.models.virtual_
 
     spec = package.construct_k8s_workflow()
 
-    print(yaml.dump(spec))
+    _debug_spec(spec)
 
-    # VV: Digest format is "${digest algorithm}x", find the first x (delimiter) and keep 6 chars after that
-    digest = ve_sum_numbers.metadata.registry.digest.split('x', 1)[1][:6]
-    constructed_name = f"{ve_sum_numbers.metadata.package.name}-{digest}"
-    assert spec['metadata']['name'].rsplit('-', 1)[0] == constructed_name
+    constructed_name = _pop_workflow_name_suffix(spec, ve_sum_numbers)
 
-    spec['metadata']['name'] = constructed_name
+    cm_name = package.configmap_embedded_files_name
 
-    # VV: This contains a timestamp
-    instance_dir_name = f"{package.instance_name}.instance"
-
-    configmap = package.construct_k8s_configmap_embedded_files('hello')
-    cm_name = configmap['metadata']['name']
-
-    assert spec == {'apiVersion': 'st4sd.ibm.com/v1alpha1',
-                    'kind': 'Workflow',
-                    'metadata': {'labels': {'rest-uid': package.rest_uid,
-                                            'workflow': package.rest_uid,
-                                            'st4sd-package-name': ve_sum_numbers.metadata.package.name,
-                                            'st4sd-package-digest': ve_sum_numbers.metadata.registry.digest},
-                                 'name': constructed_name},
-                    'spec': {'additionalOptions': package.runtime_args,
-                             'data': ['/tmp/st4sd-embedded/data/cat_me.txt'],
-                             'env': [{'name': 'INSTANCE_DIR_NAME',
-                                      'value': instance_dir_name}],
-                             'image': 'res-st4sd-team-official-base-docker-local.artifactory.'
-                                      'swg-devops.com/st4sd-runtime-core',
-                             'imagePullSecrets': [],
-                             'inputs': [],
-                             'package': {'branch': 'main',
-                                         'url': 'https://github.ibm.com/st4sd/sum-numbers.git',
-                                         'fromPath': None,
-                                         'withManifest': None},
-                             'resources': {'elaunchPrimary': {'cpu': '1', 'memory': '1Gi'}},
-                             'variables': [],
-                             'volumeMounts': [{
-                                 'name': 'embedded-files',
-                                 'mountPath': apis.runtime.package.ROOT_EMBEDDED_FILES
-                             }],
-                             'volumes': [
-                                 {
-                                     'name': 'embedded-files',
-                                     'configMap': {
-                                         'name': cm_name,
-                                         'items': [
-                                             {
-                                                 'key': 'cat_me.txt',
-                                                 'path': 'data/cat_me.txt'
-                                             }
-                                         ],
-                                     }
-                                 }
-                             ],
-                             'workingVolume': {'name': 'working-volume',
-                                               'persistentVolumeClaim': {'claimName': package.pvc_working_volume}}
-                             }}
+    _assert_workflow_spec(spec, _expected_workflow_spec(
+        package=package, ve=ve_sum_numbers, name=constructed_name, spec_package=_EXPECTED_GIT_PACKAGE,
+        data=['/tmp/st4sd-embedded/data/cat_me.txt'],
+        volume_mounts=[_VOL_MOUNT_EMBEDDED_FILES],
+        volumes=[
+            {
+                'name': 'embedded-files',
+                'configMap': {
+                    'name': cm_name,
+                    'items': [
+                        {
+                            'key': 'cat_me.txt',
+                            'path': 'data/cat_me.txt'
+                        }
+                    ],
+                }
+            }
+        ],
+    ))
 
 
 def test_package_workflow_git_commitid(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.parse_obj({})
+    namespace_presets = _EMPTY_NS_PRESETS
+    payload_config = _EMPTY_PAYLOAD
 
     base = ve_sum_numbers.base.packages[0]
 
     git_source: apis.models.virtual_experiment.BasePackageSourceGit = base.source.git
 
-    git_source.location = apis.models.virtual_experiment.SourceGitLocation(
-        url=git_source.location.url,
-        branch=None, tag=None, commit="this is a commit id")
+    git_source.location.branch = None
+    git_source.location.tag = None
+    git_source.location.commit = "this is a commit id"
     package = apis.runtime.package.NamedPackage(
-        ve_sum_numbers,
-        namespace_presets,
-        payload_config)
-
-    spec = package.construct_k8s_workflow()
-
-    print(yaml.dump(spec))
-
-    # VV: Digest format is "${digest algorithm}x", find the first x (delimiter) and keep 6 chars after that
-    digest = ve_sum_numbers.metadata.registry.digest.split('x', 1)[1][:6]
-    constructed_name = f"{ve_sum_numbers.metadata.package.name}-{digest}"
-    assert spec['metadata']['name'].rsplit('-', 1)[0] == constructed_name
-
-    spec['metadata']['name'] = constructed_name
-
-    # VV: This contains a timestamp
-    instance_dir_name = f"{package.instance_name}.instance"
-
-    assert spec == {'apiVersion': 'st4sd.ibm.com/v1alpha1',
-                    'kind': 'Workflow',
-                    'metadata': {'labels': {'rest-uid': package.rest_uid,
-                                            'workflow': package.rest_uid,
-                                            'st4sd-package-name': ve_sum_numbers.metadata.package.name,
-                                            'st4sd-package-digest': ve_sum_numbers.metadata.registry.digest},
-                                 'name': constructed_name},
-                    'spec': {'additionalOptions': package.runtime_args,
-                             'data': [],
-                             'env': [{'name': 'INSTANCE_DIR_NAME',
-                                      'value': instance_dir_name}],
-                             'image': 'res-st4sd-team-official-base-docker-local.artifactory.'
-                                      'swg-devops.com/st4sd-runtime-core',
-                             'imagePullSecrets': [],
-                             'inputs': [],
-                             'package': {'commitId': 'this is a commit id',
-                                         'url': 'https://github.ibm.com/st4sd/sum-numbers.git',
-                                         'fromPath': None,
-                                         'withManifest': None},
-                             'resources': {'elaunchPrimary': {'cpu': '1', 'memory': '1Gi'}},
-                             'variables': [],
-                             'volumeMounts': [],
-                             'volumes': [],
-                             'workingVolume': {'name': 'working-volume',
-                                               'persistentVolumeClaim': {'claimName': package.pvc_working_volume}}
-                             }}
-
-
-def test_package_workflow_git_data_s3(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.parse_obj({
-        'data': [
-            {
-                'name': 'cat_me.txt',
-                'valueFrom': {
-                    's3Ref': {
-                        "path": "some/path/cat_me.txt"
-                    }
-                }
-            }
-        ],
-        'security': {
-            's3Input': {
-                'valueFrom': {
-                    's3Ref': {
-                        "accessKeyID": "accessKeyID",
-                        "secretAccessKey": "secretAccessKey",
-                        "endpoint": "endpoint",
-                        "bucket": "bucket",
-                    }
-                }
-            }
-        }
-    })
+        ve_sum_numbers,
+        namespace_presets,
+        payload_config)
+
+    spec = package.construct_k8s_workflow()
+
+    _debug_spec(spec)
+
+    constructed_name = _pop_workflow_name_suffix(spec, ve_sum_numbers)
+
+    _assert_workflow_spec(spec, _expected_workflow_spec(
+        package=package, ve=ve_sum_numbers, name=constructed_name,
+        spec_package={'commitId': 'this is a commit id',
+                      'url': 'https://github.ibm.com/st4sd/sum-numbers.git',
+                      'fromPath': None,
+                      'withManifest': None},
+    ))
+
+
+def test_package_workflow_git_data_s3(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
+    namespace_presets = _EMPTY_NS_PRESETS
+    payload_config = _PAYLOAD_S3_DATA
 
     ve_sum_numbers.parameterisation.executionOptions.data = [
         apis.models.common.OptionMany.parse_obj({
@@ -1047,243 +1063,191 @@ def test_package_workflow_git_data_s3(ve_sum_numbers: apis.models.virtual_experi
 
     spec = package.construct_k8s_workflow()
 
-    print(yaml.dump(spec))
-
-    # VV: Digest format is "${digest algorithm}x", find the first x (delimiter) and keep 6 chars after that
-    digest = ve_sum_numbers.metadata.registry.digest.split('x', 1)[1][:6]
-    constructed_name = f"{ve_sum_numbers.metadata.package.name}-{digest}"
-    assert spec['metadata']['name'].rsplit('-', 1)[0] == constructed_name
-
-    spec['metadata']['name'] = constructed_name
+    _debug_spec(spec)
 
-    # VV: This contains a timestamp
-    instance_dir_name = f"{package.instance_name}.instance"
+    constructed_name = _pop_workflow_name_suffix(spec, ve_sum_numbers)
 
-    configmap = package.construct_k8s_configmap_embedded_files('hello')
-
-    env = sorted([{'name': 'INSTANCE_DIR_NAME',
-                   'value': f'{package.instance_name}.instance'},
-                  {'name': 'ST4SD_S3_IN_ACCESS_KEY_ID',
-                   'valueFrom': {'secretKeyRef': {'key': 'ST4SD_S3_IN_ACCESS_KEY_ID',
-                                                  'name': f'env-{package.rest_uid}'}}},
-                  {'name': 'ST4SD_S3_IN_END_POINT',
-                   'valueFrom': {'secretKeyRef': {'key': 'ST4SD_S3_IN_END_POINT',
-                                                  'name': f'env-{package.rest_uid}'}}},
-                  {'name': 'ST4SD_S3_IN_SECRET_ACCESS_KEY',
-                   'valueFrom': {'secretKeyRef': {'key': 'ST4SD_S3_IN_SECRET_ACCESS_KEY',
-                                                  'name': f'env-{package.rest_uid}'}}}],
-                 key=lambda e: e["name"])
-
-    assert spec["spec"].pop("env") == [{'name': 'INSTANCE_DIR_NAME', 'value': f'{package.instance_name}.instance'}]
-
-    assert spec == {'apiVersion': 'st4sd.ibm.com/v1alpha1',
-                    'kind': 'Workflow',
-                    'metadata': {'labels': {'rest-uid': package.rest_uid,
-                                            'workflow': package.rest_uid,
-                                            'st4sd-package-name': ve_sum_numbers.metadata.package.name,
-                                            'st4sd-package-digest': ve_sum_numbers.metadata.registry.digest},
-                                 'name': constructed_name},
-                    'spec': {'additionalOptions': package.runtime_args,
-                             'data': [os.path.join(apis.runtime.package.ROOT_S3_FILES, 'data', 'some/path/cat_me.txt')],
-                             'image': 'res-st4sd-team-official-base-docker-local.artifactory.'
-                                      'swg-devops.com/st4sd-runtime-core',
-                             'imagePullSecrets': [],
-                             'inputs': [],
-                             'package': {'branch': 'main',
-                                         'url': 'https://github.ibm.com/st4sd/sum-numbers.git',
-                                         'fromPath': None,
-                                         'withManifest': None},
-                             'resources': {'elaunchPrimary': {'cpu': '1', 'memory': '1Gi'}},
-                             'variables': [],
-                             'volumeMounts': [],
-                             's3BucketInput': {
-                                 "bucketInfo": {
-                                     label: {'valueFrom': {
-                                         'secretKeyRef': {
-                                             'name': f'env-{package.rest_uid}',
-                                             'key': f"ST4SD_S3_IN_{env_name}",
-                                         }
-                                     }} for label, env_name in [
-                                         ('bucket', "BUCKET"),
-                                         ('endpoint', "END_POINT"),
-                                         ('accessKeyID', "ACCESS_KEY_ID"),
-                                         ('secretAccessKey', "SECRET_ACCESS_KEY")
-                                     ]
-                                 }
-                             },
-                             's3FetchFilesImage': extra_opts.image_st4sd_runtime_k8s_input_s3,
-                             'volumes': [],
-                             'workingVolume': {'name': 'working-volume',
-                                               'persistentVolumeClaim': {'claimName': package.pvc_working_volume}}
-                             }}
+    _assert_workflow_spec(spec, _expected_workflow_spec(
+        package=package, ve=ve_sum_numbers, name=constructed_name, spec_package=_EXPECTED_GIT_PACKAGE,
+        data=[_EXPECTED_S3_DATA],
+        extra_spec={
+            's3BucketInput': {
+                "bucketInfo": _s3_secret_refs(f'env-{package.rest_uid}'),
+            },
+            's3FetchFilesImage': extra_opts.image_st4sd_runtime_k8s_input_s3,
+        },
+    ))
 
     secret = package.construct_k8s_secret_env_vars('hello')
 
     # VV: We store the actual credentials in a secret!
     assert secret['data'] == {
-        'ST4SD_S3_IN_ACCESS_KEY_ID': b64_str('accessKeyID'),
-        'ST4SD_S3_IN_BUCKET': b64_str('bucket'),
-        'ST4SD_S3_IN_END_POINT': b64_str('endpoint'),
-        'ST4SD_S3_IN_SECRET_ACCESS_KEY': b64_str('secretAccessKey')
+        'ST4SD_S3_IN_ACCESS_KEY_ID': _B64_ACCESS,
+        'ST4SD_S3_IN_BUCKET': _B64_BUCKET,
+        'ST4SD_S3_IN_END_POINT': _B64_ENDPOINT,
+        'ST4SD_S3_IN_SECRET_ACCESS_KEY': _B64_SECRET
     }
 
 
-def test_package_workflow_git_data_s3_with_deprecated_payload(
-        ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage
-):
-    experiment_start_obj = {
-        "s3": {
-            "accessKeyID": "accessKeyID",
-            "secretAccessKey": "secretAccessKey",
-            "endpoint": "endpoint",
-            "bucket": "bucket",
-        },
-        "data": [{
-            # The contents of this data fill will be read from S3
-            "filename": "some/path/cat_me.txt"
-        }],
-        'inputs': [
-            {"filename": "hello.txt", "content": "embed me"}
-        ]
-    }
-    deprecated = apis.models.virtual_experiment.DeprecatedExperimentStartPayload.parse_obj(experiment_start_obj)
-    from_deprecated = apis.models.virtual_experiment.PayloadExecutionOptions.from_old_payload(deprecated)
+def _get_payload_field(payload: apis.models.virtual_experiment.PayloadExecutionOptions, field: str) -> Any:
+    """Returns a (nested) field of a payload, an empty @field selects the whole payload"""
+    return operator.attrgetter(field)(payload) if field else payload
 
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.parse_obj({
-        'data': [
-            {
-                'name': 'cat_me.txt',
-                'valueFrom': {
-                    # VV: We expect the bucket name to be in security.s3Input
-                    's3Ref': {
-                        "path": "some/path/cat_me.txt",
+
+@pytest.mark.parametrize("experiment_start_obj, payload, fields", [
+    (
+        {
+            "s3": {
+                "accessKeyID": "accessKeyID",
+                "secretAccessKey": "secretAccessKey",
+                "endpoint": "endpoint",
+                "bucket": "bucket",
+            },
+            "data": [{
+                # The contents of this data fill will be read from S3
+                "filename": "some/path/cat_me.txt"
+            }],
+            'inputs': [
+                {"filename": "hello.txt", "content": "embed me"}
+            ]
+        },
+        {
+            'data': [
+                {
+                    'name': 'cat_me.txt',
+                    'valueFrom': {
+                        # VV: We expect the bucket name to be in security.s3Input
+                        's3Ref': {
+                            "path": "some/path/cat_me.txt",
+                        }
                     }
                 }
-            }
-        ],
-        'inputs': [{
-            'name': 'hello.txt',
-            'value': 'embed me',
-        }],
-        'security': {
-            's3Input': {
-                'valueFrom': {
-                    's3Ref': {
-                        'accessKeyID': "accessKeyID",
-                        'secretAccessKey': "secretAccessKey",
-                        'endpoint': "endpoint",
-                        'bucket': "bucket"
+            ],
+            'inputs': [{
+                'name': 'hello.txt',
+                'value': 'embed me',
+            }],
+            'security': {
+                's3Input': {
+                    'valueFrom': {
+                        's3Ref': {
+                            'accessKeyID': "accessKeyID",
+                            'secretAccessKey': "secretAccessKey",
+                            'endpoint': "endpoint",
+                            'bucket': "bucket"
+                        }
                     }
                 }
             }
-        }
-    })
-
-    assert len(from_deprecated.data) == len(payload_config.data)
-    assert from_deprecated.data[0].dict() == payload_config.data[0].dict()
-    assert from_deprecated.security.s3Input.my_contents.dict() == payload_config.security.s3Input.my_contents.dict()
-
-    assert len(from_deprecated.inputs) == 1
-    assert from_deprecated.inputs[0].dict() == payload_config.inputs[0].dict()
-
-
-def test_package_payload_extract_user_metadata():
-    experiment_start_obj = {
-        'metadata': {
-            'hello': 'world',
-        }
-    }
-    deprecated = apis.models.virtual_experiment.DeprecatedExperimentStartPayload.parse_obj(experiment_start_obj)
-    from_deprecated = apis.models.virtual_experiment.PayloadExecutionOptions.from_old_payload(deprecated)
-
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.parse_obj({
-        'userMetadata': [
-            {'name': 'hello', 'value': 'world'}
-        ],
-        'runtime': {
-            'resources': {
-                'cpu': '1',
-                'memory': '500Mi',
+        },
+        ('data', 'inputs', 'security.s3Input.my_contents'),
+    ),
+    (
+        {
+            'metadata': {
+                'hello': 'world',
             }
-        }
-    })
+        },
+        {
+            'userMetadata': [
+                {'name': 'hello', 'value': 'world'}
+            ],
+            'runtime': {
+                'resources': {
+                    'cpu': '1',
+                    'memory': '500Mi',
+                }
+            }
+        },
+        ('',),
+    ),
+    (
+        {
+            's3Store': {
+                'credentials': {
+                    'accessKeyID': "accessKeyID",
+                    'secretAccessKey': "secretAccessKey",
+                    'endpoint': "endpoint",
+                    'region': "region",
+                    'bucket': "my-bucket"
+                },
+                'bucketPath': "location"
+            },
+        },
+        {
+            's3Output': {
+                'valueFrom':
+                    {
+                        's3Ref': {
+                            'path': "location"
+                        }
+                    }
+            },
+            'security': {
+                's3Output': {
+                    'valueFrom': {
+                        's3Ref': {
+                            'accessKeyID': "accessKeyID",
+                            'secretAccessKey': "secretAccessKey",
+                            'endpoint': "endpoint",
+                            'region': "region",
+                            'bucket': "my-bucket",
+                        }
+                    }
+                }
+            }
+        },
+        ('security.s3Output.my_contents',),
+    ),
+], ids=["git_data_s3", "user_metadata", "store_outputs_s3"])
+def test_package_payload_from_deprecated(
+        experiment_start_obj: Dict[str, Any],
+        payload: Dict[str, Any],
+        fields: Tuple[str, ...],
+        payload_from_deprecated: Callable[[Dict[str, Any]], apis.models.virtual_experiment.PayloadExecutionOptions],
+):
+    from_deprecated = payload_from_deprecated(experiment_start_obj)
+    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.parse_obj(payload)
 
-    assert from_deprecated.userMetadata == [
-        apis.models.common.Option(name='hello', value='world')
-    ]
-    assert from_deprecated.dict() == payload_config.dict()
+    for field in fields:
+        assert _get_payload_field(from_deprecated, field) == _get_payload_field(payload_config, field), \
+            f"Unexpected {field or 'payload'}"
 
 
 def test_package_hide_s3_input_creds(
-        ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage
+        make_named_package: Callable[[Dict[str, Any]], apis.runtime.package.NamedPackage]
 ):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.parse_obj({
-        'security': {
-            's3Input': {
-                'valueFrom': {
-                    's3Ref': {
-                        "accessKeyID": "accessKeyID",
-                        "secretAccessKey": "secretAccessKey",
-                        "endpoint": "endpoint",
-                        "bucket": "bucket",
-                    }
-                }
-            }
-        }
-    })
-
-    package = apis.runtime.package.NamedPackage(
-        ve_sum_numbers,
-        namespace_presets,
-        payload_config)
+    package = make_named_package(_SECURITY_S3_INPUT)
 
     secret = package.construct_k8s_secret_env_vars('hello')
 
     assert secret['data'] == {
-        'ST4SD_S3_IN_ACCESS_KEY_ID': b64_str('accessKeyID'),
-        'ST4SD_S3_IN_BUCKET': b64_str('bucket'),
-        'ST4SD_S3_IN_END_POINT': b64_str('endpoint'),
-        'ST4SD_S3_IN_SECRET_ACCESS_KEY': b64_str('secretAccessKey')
+        'ST4SD_S3_IN_ACCESS_KEY_ID': _B64_ACCESS,
+        'ST4SD_S3_IN_BUCKET': _B64_BUCKET,
+        'ST4SD_S3_IN_END_POINT': _B64_ENDPOINT,
+        'ST4SD_S3_IN_SECRET_ACCESS_KEY': _B64_SECRET
     }
 
 
 def test_package_hide_s3_output_creds(
-        ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage
+        make_named_package: Callable[[Dict[str, Any]], apis.runtime.package.NamedPackage]
 ):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.parse_obj({
-        'security': {
-            's3Output': {
-                'valueFrom': {
-                    's3Ref': {
-                        "accessKeyID": "accessKeyID",
-                        "secretAccessKey": "secretAccessKey",
-                        "endpoint": "endpoint",
-                        'bucket': 'my-bucket',
-                    }
-                }
-            }
-        }
-    })
-
-    package = apis.runtime.package.NamedPackage(
-        ve_sum_numbers,
-        namespace_presets,
-        payload_config)
+    package = make_named_package(_SECURITY_S3_OUTPUT)
 
     secret = package.construct_k8s_secret_env_vars('hello')
 
     assert secret['data'] == {
-        'S3_ACCESS_KEY_ID': b64_str('accessKeyID'),
-        'S3_END_POINT': b64_str('endpoint'),
-        'S3_SECRET_ACCESS_KEY': b64_str('secretAccessKey')
+        'S3_ACCESS_KEY_ID': _B64_ACCESS,
+        'S3_END_POINT': _B64_ENDPOINT,
+        'S3_SECRET_ACCESS_KEY': _B64_SECRET
     }
 
 
-def test_package_store_outputs_s3(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.parse_obj({
+def test_package_store_outputs_s3(
+        make_named_package: Callable[[Dict[str, Any]], apis.runtime.package.NamedPackage]
+):
+    package = make_named_package({
+        **_SECURITY_S3_OUTPUT,
         's3Output': {
             'valueFrom':
                 {
@@ -1292,33 +1256,16 @@ def test_package_store_outputs_s3(ve_sum_numbers: apis.models.virtual_experiment
                     }
                 }
         },
-        'security': {
-            's3Output': {
-                'valueFrom': {
-                    's3Ref': {
-                        "accessKeyID": "accessKeyID",
-                        "secretAccessKey": "secretAccessKey",
-                        'bucket': 'my-bucket',
-                        "endpoint": "endpoint",
-                    }
-                }
-            }
-        }
     })
 
-    package = apis.runtime.package.NamedPackage(
-        ve_sum_numbers,
-        namespace_presets,
-        payload_config)
-
-    runtime_args = package.runtime_args
+    runtime_args = set(package.runtime_args)
 
-    _ = runtime_args.index("--s3AuthWithEnvVars")
-    _ = runtime_args.index("--s3StoreToURI=s3://my-bucket/location")
+    assert "--s3AuthWithEnvVars" in runtime_args
+    assert "--s3StoreToURI=s3://my-bucket/location" in runtime_args
 
 
 def test_read_s3_files_hide_env_vars(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
+    namespace_presets = _EMPTY_NS_PRESETS
 
     ve_sum_numbers.metadata.registry.inputs.append(apis.models.common.Option(name="renamed.txt"))
     old = apis.models.virtual_experiment.DeprecatedExperimentStartPayload.parse_obj({
@@ -1342,11 +1289,11 @@ def test_read_s3_files_hide_env_vars(ve_sum_numbers: apis.models.virtual_experim
     secret = package.construct_k8s_secret_env_vars("hello")
 
     assert secret["data"] == {
-        'ST4SD_S3_IN_ACCESS_KEY_ID': b64_str('accessKeyID'),
-        'ST4SD_S3_IN_BUCKET': b64_str('bucket'),
-        'ST4SD_S3_IN_END_POINT': b64_str('endpoint'),
-        'ST4SD_S3_IN_SECRET_ACCESS_KEY': b64_str('secretAccessKey'),
-        'ST4SD_S3_IN_REGION': b64_str('region'),
+        'ST4SD_S3_IN_ACCESS_KEY_ID': _B64_ACCESS,
+        'ST4SD_S3_IN_BUCKET': _B64_BUCKET,
+        'ST4SD_S3_IN_END_POINT': _B64_ENDPOINT,
+        'ST4SD_S3_IN_SECRET_ACCESS_KEY': _B64_SECRET,
+        'ST4SD_S3_IN_REGION': _B64_REGION,
     }
 
     assert wf["spec"]["env"] == [{'name': 'INSTANCE_DIR_NAME', 'value': f'{package.instance_name}.instance'}]
@@ -1361,23 +1308,13 @@ def test_read_s3_files_hide_env_vars(ve_sum_numbers: apis.models.virtual_experim
     assert wf['spec']['inputs'] == ["/tmp/s3-root-dir/input/renamed.txt"]
 
     assert wf["spec"]["s3BucketInput"] == {
-        "bucketInfo": {
-            'accessKeyID': {'valueFrom': {'secretKeyRef': {'key': 'ST4SD_S3_IN_ACCESS_KEY_ID',
-                                                           'name': f'env-{package.rest_uid}'}}},
-            'bucket': {'valueFrom': {'secretKeyRef': {'key': 'ST4SD_S3_IN_BUCKET',
-                                                      'name': f'env-{package.rest_uid}'}}},
-            'endpoint': {'valueFrom': {'secretKeyRef': {'key': 'ST4SD_S3_IN_END_POINT',
-                                                        'name': f'env-{package.rest_uid}'}}},
-            'secretAccessKey': {'valueFrom': {'secretKeyRef': {'key': 'ST4SD_S3_IN_SECRET_ACCESS_KEY',
-                                                               'name': f'env-{package.rest_uid}'}}},
-            'region': {'valueFrom': {'secretKeyRef': {'key': 'ST4SD_S3_IN_REGION',
-                                                               'name': f'env-{package.rest_uid}'}}}
-        }
+        "bucketInfo": _s3_secret_refs(
+            f'env-{package.rest_uid}', keys={**_S3_IN_ENV_KEYS, 'region': 'ST4SD_S3_IN_REGION'})
     }
 
 
 def test_read_s3_files_rename(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
+    namespace_presets = _EMPTY_NS_PRESETS
 
     ve_sum_numbers.metadata.registry.inputs.append(apis.models.common.Option(name="renamed.txt"))
     old = apis.models.virtual_experiment.DeprecatedExperimentStartPayload.parse_obj({
@@ -1409,7 +1346,7 @@ def test_read_s3_files_rename(ve_sum_numbers: apis.models.virtual_experiment.Par
 
 
 def test_read_dataset_files_rename(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
+    namespace_presets = _EMPTY_NS_PRESETS
 
     ve_sum_numbers.metadata.registry.inputs.append(apis.models.common.Option(name="renamed.txt"))
 
@@ -1443,31 +1380,17 @@ def test_read_dataset_files_rename(ve_sum_numbers: apis.models.virtual_experimen
     assert wf['spec']['inputs'] == ["/tmp/s3-root-dir/input/dir/file.txt:renamed.txt"]
 
 
-def test_invalid_payload_s3_missing_target_filename():
-    with pytest.raises(pydantic.error_wrappers.ValidationError):
-        old = apis.models.virtual_experiment.DeprecatedExperimentStartPayload.parse_obj({
-            'inputs': [
-                {
-                    'sourceFilename': '/dir/file.txt',
-                }
-            ]
-        })
-
-
-def test_invalid_payload_s3_both_filename_and_target_filename():
-    with pytest.raises(pydantic.error_wrappers.ValidationError):
-        old = apis.models.virtual_experiment.DeprecatedExperimentStartPayload.parse_obj({
-            'inputs': [
-                {
-                    'sourceFilename': '/dir/file.txt',
-                    'filename': "other-file.txt"
-                }
-            ]
-        })
+@pytest.mark.parametrize("input_file", [
+    {'sourceFilename': '/dir/file.txt'},
+    {'sourceFilename': '/dir/file.txt', 'filename': "other-file.txt"},
+], ids=["s3_missing_target_filename", "s3_both_filename_and_target_filename"])
+def test_invalid_payload_rejected(input_file: Dict[str, str]):
+    with pytest.raises(ValidationError):
+        apis.models.virtual_experiment.DeprecatedExperimentStartPayload.parse_obj({'inputs': [input_file]})
 
 
 def test_read_s3_files_simple(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
+    namespace_presets = _EMPTY_NS_PRESETS
 
     ve_sum_numbers.metadata.registry.inputs.append(apis.models.common.Option(name="file.txt"))
 
@@ -1491,138 +1414,72 @@ def test_read_s3_files_simple(ve_sum_numbers: apis.models.virtual_experiment.Par
     assert wf['spec']['inputs'] == ["/tmp/s3-root-dir/input/dir/file.txt"]
 
 
-def test_experiment_id_usermetadata(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions()
+def test_experiment_name(
+        sum_numbers_experiment_name: str,
+        make_named_package: Callable[[Dict[str, Any]], apis.runtime.package.NamedPackage],
+):
+    package = make_named_package({})
 
-    package = apis.runtime.package.NamedPackage(
-        ve_sum_numbers,
-        namespace_presets,
-        payload_config)
+    assert package.experiment_name == sum_numbers_experiment_name
 
-    runtime_args = package.runtime_args
 
-    experiment_id = apis.models.common.PackageIdentifier.from_parts(
-        package_name=ve_sum_numbers.metadata.package.name,
-        tag=None,
-        digest=ve_sum_numbers.metadata.registry.digest).identifier
+def test_experiment_id_usermetadata(
+        ve_sum_numbers_readonly: apis.models.virtual_experiment.ParameterisedPackage,
+        make_named_package: Callable[[Dict[str, Any]], apis.runtime.package.NamedPackage],
+):
+    package = make_named_package({})
+
+    runtime_args = set(package.runtime_args)
 
-    _ = runtime_args.index(f"-mexperiment-id:{experiment_id}")
+    experiment_id = _pkg_ident(
+        ve_sum_numbers_readonly.metadata.package.name, ve_sum_numbers_readonly.metadata.registry.digest)
 
+    assert f"-mexperiment-id:{experiment_id}" in runtime_args
 
-def test_package_with_user_metadata(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.parse_obj({
+
+def test_package_with_user_metadata(
+        make_named_package: Callable[[Dict[str, Any]], apis.runtime.package.NamedPackage]
+):
+    package = make_named_package({
         'userMetadata': [
             {'name': 'hello', 'value': 'world'}
         ]
     })
 
-    package = apis.runtime.package.NamedPackage(
-        ve_sum_numbers,
-        namespace_presets,
-        payload_config)
-
-    package.runtime_args.index('-mhello:world')
-
+    assert '-mhello:world' in package.runtime_args
 
-def test_packate_inject_generated_user_metadata(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions()
 
-    package = apis.runtime.package.NamedPackage(
-        ve_sum_numbers,
-        namespace_presets,
-        payload_config)
+def test_packate_inject_generated_user_metadata(
+        ve_sum_numbers_readonly: apis.models.virtual_experiment.ParameterisedPackage,
+        make_named_package: Callable[[Dict[str, Any]], apis.runtime.package.NamedPackage],
+):
+    package = make_named_package({})
 
+    rest_uid = package.rest_uid
     labels = {
-        'rest-uid': package.rest_uid,
-        'workflow': package.rest_uid,
-        'st4sd-package-name': ve_sum_numbers.metadata.package.name,
-        'st4sd-package-digest': ve_sum_numbers.metadata.registry.digest,
+        'rest-uid': rest_uid,
+        'workflow': rest_uid,
+        'st4sd-package-name': ve_sum_numbers_readonly.metadata.package.name,
+        'st4sd-package-digest': ve_sum_numbers_readonly.metadata.registry.digest,
     }
 
     args = package.runtime_args
+    args_set = set(args)
 
-    print(args)
+    if _VERBOSE:
+        print(args)
 
     for name, value in labels.items():
-        args.index(f'-m{name}:{value}')
-
-
-def test_package_store_outputs_s3_from_deprecated(
-        ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage
-):
-    experiment_start_obj = {
-        's3Store': {
-            'credentials': {
-                'accessKeyID': "accessKeyID",
-                'secretAccessKey': "secretAccessKey",
-                'endpoint': "endpoint",
-                'region': "region",
-                'bucket': "my-bucket"
-            },
-            'bucketPath': "location"
-        },
-    }
-    deprecated = apis.models.virtual_experiment.DeprecatedExperimentStartPayload.parse_obj(experiment_start_obj)
-    from_deprecated = apis.models.virtual_experiment.PayloadExecutionOptions.from_old_payload(deprecated)
-
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.parse_obj({
-        's3Output': {
-            'valueFrom':
-                {
-                    's3Ref': {
-                        'path': "location"
-                    }
-                }
-        },
-        'security': {
-            's3Output': {
-                'valueFrom': {
-                    's3Ref': {
-                        'accessKeyID': "accessKeyID",
-                        'secretAccessKey': "secretAccessKey",
-                        'endpoint': "endpoint",
-                        'region': "region",
-                        'bucket': "my-bucket",
-                    }
-                }
-            }
-        }
-    })
-
-    print("From Deprecated", from_deprecated.security.s3Output.my_contents.dict())
-    print("From PayloadConfig", payload_config.security.s3Output.my_contents.dict())
+        assert f'-m{name}:{value}' in args_set
 
-    assert from_deprecated.security.s3Output.my_contents.dict() == payload_config.security.s3Output.my_contents.dict()
 
-
-def test_package_store_outputs_dataset(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
+def test_package_store_outputs_dataset(ve_sum_numbers_readonly: apis.models.virtual_experiment.ParameterisedPackage):
     # VV: Unfortunately we cannot FULLY test the "datasetRef" approach because that involves querying
     # Kubernetes for a Dataset object and then extracting its S3 credentials to convert it into 's3Ref'
 
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.parse_obj({
-        's3Output': {
-            'valueFrom':
-                {
-                    'datasetRef': {
-                        'name': 'replace me',
-                        'path': 'location',
-                    }
-                }
-        },
-        'security': {
-            's3Output': {
-                'valueFrom': {
-                    'datasetRef': {
-                        "name": 'replace me'
-                    }
-                }
-            }
-        }
-    })
+    namespace_presets = _EMPTY_NS_PRESETS
+    # VV: configure_output_s3() below updates the payload
+    payload_config = _PAYLOAD_DATASET_OUTPUT.copy(deep=True)
 
     # VV: this happens inside apis.experiments.ExperimentStart.post()
     s3_security = apis.models.common.OptionFromS3Values.parse_obj({
@@ -1635,29 +1492,29 @@ def test_package_store_outputs_dataset(ve_sum_numbers: apis.models.virtual_exper
     payload_config.configure_output_s3('location', s3_security)
 
     package = apis.runtime.package.NamedPackage(
-        ve_sum_numbers,
+        ve_sum_numbers_readonly,
         namespace_presets,
         payload_config)
 
-    runtime_args = package.runtime_args
+    runtime_args = set(package.runtime_args)
 
-    print(runtime_args)
+    if _VERBOSE:
+        print(runtime_args)
 
-    _ = runtime_args.index("--s3AuthWithEnvVars")
-    _ = runtime_args.index("--s3StoreToURI=s3://my-bucket/location")
+    assert "--s3AuthWithEnvVars" in runtime_args
+    assert "--s3StoreToURI=s3://my-bucket/location" in runtime_args
 
     secret = package.construct_k8s_secret_env_vars('hello')
 
     assert secret['data'] == {
-        'S3_ACCESS_KEY_ID': b64_str('accessKeyID'),
-        'S3_END_POINT': b64_str('endpoint'),
-        'S3_SECRET_ACCESS_KEY': b64_str('secretAccessKey')
+        'S3_ACCESS_KEY_ID': _B64_ACCESS,
+        'S3_END_POINT': _B64_ENDPOINT,
+        'S3_SECRET_ACCESS_KEY': _B64_SECRET
     }
 
     wf = package.construct_k8s_workflow()
 
-    keys = ['S3_ACCESS_KEY_ID', 'S3_END_POINT', 'S3_SECRET_ACCESS_KEY']
-    envs = sorted([x for x in wf['spec']['env'] if x['name'] in keys], key=lambda x: x['name'])
+    envs = sorted((x for x in wf['spec']['env'] if x['name'] in _S3_OUT_ENV_KEY_SET), key=operator.itemgetter('name'))
     secret_name = f'env-{package.rest_uid}'
 
     assert envs == [
@@ -1669,55 +1526,38 @@ def test_package_store_outputs_dataset(ve_sum_numbers: apis.models.virtual_exper
                     'key': what,
                 }
             }
-        } for what in sorted(keys)
+        } for what in _S3_OUT_ENV_KEYS
     ]
 
 
 def test_derived_package(derived_ve: apis.models.virtual_experiment.ParameterisedPackage):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions()
+    namespace_presets = _EMPTY_NS_PRESETS
+    payload_config = _EMPTY_PAYLOAD
     package = apis.runtime.package.NamedPackage(derived_ve, namespace_presets, payload_config)
 
     spec = package.construct_k8s_workflow()
 
-    print(yaml.dump(spec))
-
-    # VV: Digest format is "${digest algorithm}x", find the first x (delimiter) and keep 6 chars after that
-    digest = derived_ve.metadata.registry.digest.split('x', 1)[1][:6]
-    constructed_name = f"{derived_ve.metadata.package.name}-{digest}"
-    assert spec['metadata']['name'].rsplit('-', 1)[0] == constructed_name
-
-    spec['metadata']['name'] = constructed_name
+    _debug_spec(spec)
 
-    # VV: This contains a timestamp
-    instance_dir_name = f"{package.instance_name}.instance"
+    constructed_name = _pop_workflow_name_suffix(spec, derived_ve)
 
     from_path = os.path.join(apis.models.constants.ROOT_STORE_DERIVED_PACKAGES,
                              derived_ve.metadata.package.name,
                              derived_ve.get_packages_identifier())
+    assert package.get_path_to_multi_package_pvep() == from_path
 
-    assert spec == {'apiVersion': 'st4sd.ibm.com/v1alpha1',
-                    'kind': 'Workflow',
-                    'metadata': {'labels': {'rest-uid': package.rest_uid,
-                                            'workflow': package.rest_uid,
-                                            'st4sd-package-name': derived_ve.metadata.package.name,
-                                            'st4sd-package-digest': derived_ve.metadata.registry.digest},
-                                 'name': constructed_name},
-                    'spec': {'additionalOptions': package.runtime_args,
-                             'data': [],
-                             'env': [{'name': 'INSTANCE_DIR_NAME',
-                                      'value': instance_dir_name}],
-                             'image': 'res-st4sd-team-official-base-docker-local.artifactory.swg-devops.com/st4sd-runtime-core',
-                             'imagePullSecrets': [],
-                             'inputs': [],
-                             'package': {'fromPath': from_path},
-                             'resources': {'elaunchPrimary': {'cpu': '1', 'memory': '1Gi'}},
-                             'variables': [],
-                             'volumeMounts': [],
-                             'volumes': [],
-                             'workingVolume': {'name': 'working-volume',
-                                               'persistentVolumeClaim': {'claimName': package.pvc_working_volume}}
-                             }}
+    _assert_workflow_spec(spec, _expected_workflow_spec(
+        package=package, ve=derived_ve, name=constructed_name, spec_package={'fromPath': from_path}))
+
+
+def test_packages_identifier_follows_base_changes(
+        ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage
+):
+    before = ve_sum_numbers.get_packages_identifier()
+    assert ve_sum_numbers.get_packages_identifier() == before
+
+    ve_sum_numbers.base.packages[0].source.git.location.branch = "other-branch"
+    assert ve_sum_numbers.get_packages_identifier() != before
 
 
 def test_package_deprecated_start_with_variables(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
@@ -1728,7 +1568,7 @@ def test_package_deprecated_start_with_variables(ve_sum_numbers: apis.models.vir
     }
     deprecated = apis.models.virtual_experiment.DeprecatedExperimentStartPayload.parse_obj(experiment_start_obj)
     payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.from_old_payload(deprecated)
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
+    namespace_presets = _EMPTY_NS_PRESETS
 
     ve_sum_numbers.parameterisation.executionOptions.variables.append(
         apis.models.common.OptionMany(name="numberOfPoints", value="3")
@@ -1745,48 +1585,37 @@ def test_package_deprecated_start_with_variables(ve_sum_numbers: apis.models.vir
     assert package.workflow_variables == {'numberOfPoints': '1'}
 
 
+@pytest.mark.xdist_group("psi4")
 def test_validate_adapt_and_store_experiment_to_database(
-        flowir_psi4: str,
+        psi4_storage_metadata: apis.models.virtual_experiment.StorageMetadata,
         ve_psi4: apis.models.virtual_experiment.ParameterisedPackage,
-        output_dir: str
+        monkeypatch: pytest.MonkeyPatch,
 ):
-    pkg_location = package_from_files(
-        location=os.path.join(output_dir, "psi4"),
-        files={
-            'bin/aggregate_energies.py': 'expensive',
-            'bin/optimize_ff.py': 'expensive',
-            'bin/optimize_psi4.py': 'expensive',
-
-            'conf/flowir_package.yaml': flowir_psi4,
-        }
-    )
-
-    StorageMetadata = apis.models.virtual_experiment.StorageMetadata
-    collection = apis.storage.PackageMetadataCollection({
-        ve_psi4.base.packages[0].name: StorageMetadata.from_config(
-            prefix_paths=pkg_location, config=apis.models.virtual_experiment.BasePackageConfig(),
-        )})
+    collection = apis.storage.PackageMetadataCollection({ve_psi4.base.packages[0].name: psi4_storage_metadata})
 
     original_created_on = ve_psi4.metadata.registry.createdOn
 
-    # VV: Ensure that validate_parameterised_package() updates createdOn, and digest
-    time.sleep(0.1)
+    # VV: Ensure that validate_parameterised_package() updates createdOn, and digest. Every timestamp that the
+    # fake clock generates is 1 second after the previous one (and after the original createdOn)
+    start = datetime.datetime.now(datetime.timezone.utc)
+    ticks = itertools.count(1)
+    monkeypatch.setattr(apis.models.virtual_experiment, "_utc_now",
+                        lambda: start + datetime.timedelta(seconds=next(ticks)))
     ve_psi4.metadata.registry.digest = "invalid"
 
-    with tempfile.NamedTemporaryFile(suffix=".json", prefix="experiments", delete=True) as f:
-        db = apis.db.exp_packages.DatabaseExperiments(f.name)
-
-        metadata = apis.runtime.package.access_and_validate_virtual_experiment_packages(ve_psi4, collection, db)
-        apis.runtime.package.validate_parameterised_package(ve=ve_psi4, metadata=metadata)
+    # VV: The file-backed database has its own tests in test_db.py, this one only needs somewhere to store entries
+    db = apis.db.exp_packages.DatabaseExperiments(db_path=None)
 
-        with db:
-            db.push_new_entry(ve_psi4)
+    metadata = apis.runtime.package.access_and_validate_virtual_experiment_packages(ve_psi4, collection, db)
+    apis.runtime.package.validate_parameterised_package(ve=ve_psi4, metadata=metadata)
 
-        with db:
-            doc = db.query()
-            assert len(doc) == 1
+    # VV: Push and query within a single database session
+    with db:
+        db.push_new_entry(ve_psi4)
+        doc = db.query()
+        assert len(doc) == 1
 
-        x = apis.models.virtual_experiment.ParameterisedPackage.parse_obj(doc[0])
+        x = apis.models.virtual_experiment.ParameterisedPackage.model_validate(doc[0])
         assert x.metadata.registry.createdOn > original_created_on
         assert x.metadata.registry.digest == x.to_digestable().to_digest()
         assert x.metadata.registry.digest != "invalid"
@@ -1796,30 +1625,29 @@ def test_validate_adapt_and_store_experiment_to_database(
 
         metadata = apis.runtime.package.access_and_validate_virtual_experiment_packages(ve_psi4, collection, db)
         apis.runtime.package.validate_parameterised_package(ve=ve_psi4, metadata=metadata)
-        with db:
-            db.push_new_entry(ve_psi4)
+        db.push_new_entry(ve_psi4)
 
-        with db:
-            many_docs = db.query()
-            assert len(many_docs) == 2
+        many_docs = db.query()
+        assert len(many_docs) == 2
 
-            ql = db.construct_query(package_name=ve_psi4.metadata.package.name, registry_tag="latest")
-            latest = db.query(ql)
+        ql = db.construct_query(package_name=ve_psi4.metadata.package.name, registry_tag="latest")
+        latest = db.query(ql)
 
-        assert len(latest) == 1
-        latest = apis.models.virtual_experiment.ParameterisedPackage.parse_obj(latest[0])
+    assert len(latest) == 1
+    latest = apis.models.virtual_experiment.ParameterisedPackage.model_validate(latest[0])
 
-        assert latest.metadata.registry.digest != "invalid"
-        assert latest.base.packages[0].source.git.location.branch == "other_branch"
-        assert latest.base.packages[0].source.git.version == "totally-new-version"
+    assert latest.metadata.registry.digest != "invalid"
+    assert latest.base.packages[0].source.git.location.branch == "other_branch"
+    assert latest.base.packages[0].source.git.version == "totally-new-version"
 
-        assert latest.metadata.registry.digest != x.metadata.registry.digest
-        assert latest.metadata.registry.createdOn > x.metadata.registry.createdOn
+    assert latest.metadata.registry.digest != x.metadata.registry.digest
+    assert latest.metadata.registry.createdOn > x.metadata.registry.createdOn
 
-        assert latest.registry_created_on > x.registry_created_on
+    assert latest.registry_created_on > x.registry_created_on
 
 
-def test_extract_all_variables_during_validate(
+@pytest.mark.xdist_group("psi4")
+def test_extract_all_variables_during_validate_with_override(
         flowir_psi4: str,
         ve_psi4: apis.models.virtual_experiment.ParameterisedPackage,
         output_dir: str
@@ -1828,7 +1656,7 @@ def test_extract_all_variables_during_validate(
     # It exists in 3 platforms, `default`, `openshift`, and `dont-care`. The registry should only display its values
     # for the `default` and `openshift` platforms.
 
-    raw_yaml = yaml.load(flowir_psi4, yaml.FullLoader)
+    raw_yaml = yaml.load(flowir_psi4, Loader=_SafeLoader)
 
     raw_yaml['variables']['default']['global']['overrideme'] = 'default'
     raw_yaml['variables']['openshift']['global']['overrideme'] = 'openshift'
@@ -1838,7 +1666,7 @@ def test_extract_all_variables_during_validate(
         }
     }
 
-    flowir_psi4 = yaml.dump(raw_yaml)
+    flowir_psi4 = yaml.dump(raw_yaml, Dumper=_SafeDumper, default_flow_style=False)
 
     pkg_location = package_from_files(
         location=os.path.join(output_dir, "psi4"),
@@ -1861,15 +1689,14 @@ def test_extract_all_variables_during_validate(
 
     ve_psi4.metadata.registry.digest = "invalid"
 
-    raw_yaml = yaml.load(flowir_psi4, yaml.FullLoader)
+    raw_yaml = yaml.load(flowir_psi4, Loader=_SafeLoader)
 
     vars_default: Dict[str, str] = raw_yaml['variables']['default']['global']
     vars_openshift: Dict[str, str] = raw_yaml['variables']['openshift']['global']
 
-    with tempfile.NamedTemporaryFile(suffix=".json", prefix="experiments", delete=True) as f:
-        db = apis.db.exp_packages.DatabaseExperiments(f.name)
-        metadata = apis.runtime.package.access_and_validate_virtual_experiment_packages(ve_psi4, collection, db)
-        apis.runtime.package.validate_parameterised_package(ve=ve_psi4, metadata=metadata)
+    db = apis.db.exp_packages.DatabaseExperiments(db_path=None)
+    metadata = apis.runtime.package.access_and_validate_virtual_experiment_packages(ve_psi4, collection, db)
+    apis.runtime.package.validate_parameterised_package(ve=ve_psi4, metadata=metadata)
 
     all_vars = ve_psi4.metadata.registry.executionOptionsDefaults.variables
     logger.info(f"All executionOptionDefaults "
@@ -1901,21 +1728,12 @@ def test_extract_all_variables_during_validate(
         assert values[0] == str(vars_openshift[name])
 
 
-def test_extract_all_variables_during_validate(
-        flowir_psi4: str,
+@pytest.mark.xdist_group("psi4")
+def test_extract_all_variables_during_validate_with_unknown_variable(
+        psi4_storage_metadata: apis.models.virtual_experiment.StorageMetadata,
         ve_psi4: apis.models.virtual_experiment.ParameterisedPackage,
-        output_dir: str
 ):
-    pkg_location = package_from_files(
-        location=os.path.join(output_dir, "psi4"),
-        files={'conf/flowir_package.yaml': flowir_psi4, }
-    )
-
-    StorageMetadata = apis.models.virtual_experiment.StorageMetadata
-    collection = apis.storage.PackageMetadataCollection({
-        ve_psi4.base.packages[0].name: StorageMetadata.from_config(
-            prefix_paths=pkg_location, config=apis.models.virtual_experiment.BasePackageConfig(),
-        )})
+    collection = apis.storage.PackageMetadataCollection({ve_psi4.base.packages[0].name: psi4_storage_metadata})
 
     original_created_on = ve_psi4.metadata.registry.createdOn
 
@@ -1924,40 +1742,29 @@ def test_extract_all_variables_during_validate(
         apis.models.common.OptionMany(name=unknown_variable)
     )
 
-    with tempfile.NamedTemporaryFile(suffix=".json", prefix="experiments", delete=True) as f:
-        db = apis.db.exp_packages.DatabaseExperiments(f.name)
-        with pytest.raises(apis.models.errors.UnknownVariableError) as e:
-            metadata = apis.runtime.package.access_and_validate_virtual_experiment_packages(ve_psi4, collection, db)
-            apis.runtime.package.validate_parameterised_package(ve=ve_psi4, metadata=metadata)
+    db = apis.db.exp_packages.DatabaseExperiments(db_path=None)
+    with pytest.raises(apis.models.errors.UnknownVariableError) as e:
+        metadata = apis.runtime.package.access_and_validate_virtual_experiment_packages(ve_psi4, collection, db)
+        apis.runtime.package.validate_parameterised_package(ve=ve_psi4, metadata=metadata)
 
     assert e.value.variable_name == unknown_variable
 
 
-def test_missing_input(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
-
-    ve_sum_numbers.metadata.registry.inputs.append(apis.models.common.Option(name="input_smiles.csv"))
-
-    old = apis.models.virtual_experiment.DeprecatedExperimentStartPayload.parse_obj({})
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.from_old_payload(old)
-    with pytest.raises(apis.models.errors.InvalidInputsError) as e:
-        apis.runtime.package.NamedPackage(ve_sum_numbers, namespace_presets, payload_config)
-
-    e = e.value
-
-    assert e.missing_inputs == ['input_smiles.csv']
-
-
-def test_extra_input(ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage):
-    namespace_presets = apis.models.virtual_experiment.NamespacePresets()
+@pytest.mark.parametrize("registry_inputs, experiment_start_obj, attribute", [
+    (["input_smiles.csv"], {}, "missing_inputs"),
+    ([], {"inputs": [{"filename": "input_smiles.csv", "content": "hello"}]}, "extra_inputs"),
+], ids=["missing_input", "extra_input"])
+def test_invalid_inputs(
+        registry_inputs: List[str],
+        experiment_start_obj: Dict[str, Any],
+        attribute: str,
+        ve_sum_numbers: apis.models.virtual_experiment.ParameterisedPackage,
+        payload_from_deprecated: Callable[[Dict[str, Any]], apis.models.virtual_experiment.PayloadExecutionOptions],
+):
+    ve_sum_numbers.metadata.registry.inputs.extend(apis.models.common.Option(name=x) for x in registry_inputs)
+    payload_config = payload_from_deprecated(experiment_start_obj)
 
-    old = apis.models.virtual_experiment.DeprecatedExperimentStartPayload.parse_obj({
-        "inputs": [{"filename": "input_smiles.csv", "content": "hello"}]
-    })
-    payload_config = apis.models.virtual_experiment.PayloadExecutionOptions.from_old_payload(old)
     with pytest.raises(apis.models.errors.InvalidInputsError) as e:
-        apis.runtime.package.NamedPackage(ve_sum_numbers, namespace_presets, payload_config)
-
-    e = e.value
+        apis.runtime.package.NamedPackage(ve_sum_numbers, _EMPTY_NS_PRESETS, payload_config)
 
-    assert e.extra_inputs == ['input_smiles.csv']
+    assert getattr(e.value, attribute) == ['input_smiles.csv']
@@ -4,35 +4,56 @@
 #   Vassilis Vassiliadis
 
 
-import io
 import os
 import pathlib
+import tempfile
 import zipfile
 
+from typing import Any
+from typing import Dict
+
+import pytest
+
 import apis.storage
 import apis.storage.actuators
 import apis.storage.actuators.memory
 import apis.storage.actuators.local
 import apis.storage.actuators.s3
 
-def test_stream_zip(output_dir: str):
-    os.makedirs(os.path.join(output_dir, "in", "a", "b"))
 
-    with open(os.path.join(output_dir, "in", "hello"), 'w') as f:
-        f.write("hello")
+@pytest.fixture(scope="module")
+def zip_fixture_dir(tmp_path_factory: pytest.TempPathFactory) -> str:
+    """Returns a directory with the files in/hello and in/a/b/world, tests must not modify it"""
+    root = tmp_path_factory.mktemp("zipfx")
+    (root / "in/a/b").mkdir(parents=True)
+    (root / "in/hello").write_bytes(b"hello")
+    (root / "in/a/b/world").write_bytes(b"world")
+
+    return str(root)
 
-    with open(os.path.join(output_dir, "in", "a", "b", "world"), 'w') as f:
-        f.write("world")
 
-    x = apis.storage.IterableStreamZipOfDirectory(os.path.join(output_dir, "in"))
+def _tree(storage: apis.storage.actuators.local.LocalStorage, path: str) -> Dict[str, Any]:
+    """Returns {name: contents} for files and {name: {...}} for directories under @path
+
+    LocalStorage.listdir() uses os.scandir() so telling files apart from directories does not need extra stat calls.
+    """
+    return {
+        p.name: _tree(storage, os.path.join(path, p.name)) if p.isdir else storage.read(os.path.join(path, p.name))
+        for p in storage.listdir(path)
+    }
 
-    y = b""
-    for chunk in x:
-        y += chunk
 
-    z = zipfile.ZipFile(io.BytesIO(y), mode='r')
+def test_stream_zip(zip_fixture_dir: str):
+    x = apis.storage.IterableStreamZipOfDirectory(os.path.join(zip_fixture_dir, "in"))
 
-    files = {k: z.read(k) for k in z.namelist()}
+    # VV: Keep small archives in memory but spill big ones to the disk instead of holding 2 copies of them in memory
+    with tempfile.SpooledTemporaryFile(max_size=1 << 20) as buf:
+        for chunk in x:
+            buf.write(chunk)
+        buf.seek(0)
+
+        with zipfile.ZipFile(buf, mode='r') as z:
+            files = {k: z.read(k) for k in z.namelist()}
 
     assert files['/hello'] == b"hello"
     assert files['/a/b/world'] == b"world"
@@ -80,13 +101,7 @@ def test_inmemory_copy_to_local(output_dir: str):
     dest = apis.storage.actuators.local.LocalStorage()
     dest.copy(source=source, source_path="/path", dest_path=output_dir)
 
-    top_level = [p.name for p in dest.listdir(output_dir)]
-    assert top_level == ["to"]
-
-    actual_dir = [p.name for p in dest.listdir(os.path.join(output_dir, "to"))]
-    assert actual_dir == ["file"]
-
-    assert dest.read(pathlib.Path(output_dir)/"to/file") == contents
+    assert _tree(dest, output_dir) == {"to": {"file": contents}}
 
 
 def test_local_copy_to_inmemory(output_dir: str):
@@ -95,10 +110,8 @@ def test_local_copy_to_inmemory(output_dir: str):
     source = apis.storage.actuators.local.LocalStorage()
     dest = apis.storage.actuators.memory.InMemoryStorage({})
 
-    os.makedirs(os.path.join(output_dir, "path/to"), exist_ok=True)
-
-    with open(pathlib.Path(output_dir)/"path/to/file", 'wb') as f:
-        f.write(contents)
+    (pathlib.Path(output_dir)/"path/to").mkdir(parents=True, exist_ok=True)
+    (pathlib.Path(output_dir)/"path/to/file").write_bytes(contents)
 
     dest.copy(source=source, source_path=pathlib.Path(output_dir)/"path", dest_path="/")
 
@@ -519,7 +519,7 @@ components:
     arguments: hello world
     """
 
-    flowir = yaml.load(flowir, Loader=yaml.SafeLoader)
+    flowir = yaml.load(flowir, Loader=tests.conftest.SafeLoader)
     concrete = experiment.model.frontends.flowir.FlowIRConcrete(flowir, 'default', {})
     all_vars = apis.models.virtual_experiment.characterize_variables(
         concrete, ['openshift', 'openshift-kubeflux', 'openshift-cpu'])
@@ -721,7 +721,7 @@ def test_transformation_push_and_then_synthesize(
 
     assert len(docs) == 1
 
-    ve = apis.models.virtual_experiment.ParameterisedPackage.parse_obj(docs[0])
+    ve = apis.models.virtual_experiment.ParameterisedPackage.model_validate(docs[0])
 
     assert ve.metadata.registry.digest == metadata.package.metadata.registry.digest
 
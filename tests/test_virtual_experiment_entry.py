@@ -493,7 +493,7 @@ def test_check_metadata_registry_platforms(flowir_fixture_name: str,
         with apis.db.exp_packages.DatabaseExperiments(f.name) as db:
             apis.kernel.experiments.validate_and_store_pvep_in_db(collection, wf_ve, db)
             res = db.query_identifier(wf_ve.metadata.package.name)
-            retrieved_pvep = apis.models.virtual_experiment.ParameterisedPackage.parse_obj(res[0])
+            retrieved_pvep = apis.models.virtual_experiment.ParameterisedPackage.model_validate(res[0])
             assert sorted(retrieved_pvep.metadata.registry.platforms) == sorted(expected_platforms)
 
             assert "internal-experiment" not in retrieved_pvep.metadata.package.keywords
@@ -541,7 +541,7 @@ def test_check_metadata_output(
             ]
 
             res = db.query_identifier(ve_dsl2_with_key_output.metadata.package.name)
-            retrieved_pvep = apis.models.virtual_experiment.ParameterisedPackage.parse_obj(res[0])
+            retrieved_pvep = apis.models.virtual_experiment.ParameterisedPackage.model_validate(res[0])
 
             assert "internal-experiment" not in retrieved_pvep.metadata.package.keywords
 